@@ -2,7 +2,8 @@ import random
 import cv2
 import numpy as np
 from hashlib import md5
-from model import Web_Detector
+import argparse
+from model import Web_Detector, PRECISIONS, DEFAULT_CALIBRATION_SOURCE
 from chinese_name_list import Label_list
 
 def generate_color_based_on_name(name):
@@ -58,9 +59,16 @@ def process_frame(model, image):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Offside detection image demo')
+    parser.add_argument('--precision', type=str, default='fp32', choices=PRECISIONS,
+                        help='Inference precision; int8 calibrates and exports an INT8 OpenVINO model on first use')
+    parser.add_argument('--calibration_source', type=str, default=DEFAULT_CALIBRATION_SOURCE,
+                        help='Image directory used to calibrate the INT8 model')
+    args = parser.parse_args()
+
     cls_name = Label_list
     model = Web_Detector()
-    model.load_model("./runs/segment/train4/weights/best.pt")
+    model.load_model("./runs/segment/train4/weights/best.pt", args.precision, args.calibration_source)
 
     # 图片处理
     image_path = './icon/football.png'
@@ -1,17 +1,18 @@
 import cv2
 import numpy as np
-from model import Web_Detector
+import argparse
+from model import Web_Detector, PRECISIONS, DEFAULT_CALIBRATION_SOURCE
 from offside_detector import OffsideDetector
 import os
 
-def test_offside_system():
+def test_offside_system(precision="fp32", calibration_source=DEFAULT_CALIBRATION_SOURCE):
     """测试越位检测系统"""
     print("开始测试越位检测系统...")
     
     # 加载模型
     print("正在加载球场分割模型...")
     model = Web_Detector()
-    model.load_model("./runs/segment/train4/weights/best.pt")
+    model.load_model("./runs/segment/train4/weights/best.pt", precision, calibration_source)
     
     # 初始化越位检测器
     print("正在初始化越位检测器...")
@@ -72,4 +73,10 @@ def test_offside_system():
     print("\n测试完成")
 
 if __name__ == "__main__":
-    test_offside_system() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Offside detection system test')
+    parser.add_argument('--precision', type=str, default='fp32', choices=PRECISIONS,
+                        help='Inference precision; int8 calibrates and exports an INT8 OpenVINO model on first use')
+    parser.add_argument('--calibration_source', type=str, default=DEFAULT_CALIBRATION_SOURCE,
+                        help='Image directory used to calibrate the INT8 model')
+    args = parser.parse_args()
+    test_offside_system(args.precision, args.calibration_source)
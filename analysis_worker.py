@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""常驻分析 worker：模型常驻内存，通过本地 socket 接收 run_AIGC 任务
+
+原来每个任务都要启动 run_AIGC.py，它再以子进程启动 football_main/main.py，
+每次都要重新启动 Python、导入 torch / ultralytics / sklearn 并加载 YOLO 权重。
+worker 启动时完成这些工作，之后逐个执行任务（run_AIGC.main 在本进程中运行），
+任务的输出逐行发回客户端，最后发回退出码。
+
+启动: python analysis_worker.py [--port 5002]
+客户端: submit_job(argv, env, timeout) 先产出 ("queued", 排队位置)，开始执行时产出 ("started", None)，
+然后逐个产出 ("line", 标准输出的一行) / ("stderr", 标准错误的一行)，最后产出 ("exit", 退出码)。
+任务按提交顺序在同一个线程中逐个执行。
+线程无法被强制终止，任务超过 timeout 时 worker 通知客户端后整个进程退出，由服务端重新启动。
+"""
+import os
+import re
+import sys
+import time
+import queue
+import argparse
+import threading
+import contextlib
+from datetime import datetime
+from multiprocessing.connection import Listener, Client
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ADDRESS = ('127.0.0.1', 5002)
+# 只用于区分本机上的其他服务，不是安全边界；worker 只监听 127.0.0.1
+DEFAULT_AUTHKEY = b'football-analysis-worker'
+# 与 Popen(text=True) 的通用换行一致：\r\n、\r、\n 都是行结束符（tqdm 用 \r 刷新进度条）
+LINE_END = re.compile(r'\r\n|\r|\n')
+# worker 自身的超时处理失效（例如卡在持有 GIL 的 C 扩展里）时，客户端在 timeout 之后再等待的秒数
+TIMEOUT_GRACE = 30
+
+
+def print_debug_info(message):
+    """打印调试信息，带时间戳"""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[DEBUG {timestamp}] {message}")
+
+
+class ConnectionWriter:
+    """把任务期间的 stdout 或 stderr 按行发回客户端，消息类型为 kind；客户端断开后静默丢弃
+
+    同一连接上的 stdout / stderr 两个 writer 共用 lock，保证消息不会交错发送。
+    """
+    def __init__(self, conn, kind="line", lock=None):
+        self.conn = conn
+        self.kind = kind
+        self.buffer = ""
+        self.lock = lock or threading.Lock()
+        self.connected = True
+
+    def write(self, text):
+        with self.lock:
+            self.buffer += text
+            # 末尾的 \r 可能是被拆开的 \r\n，留到下一次写入再切分
+            pending = "\r" if self.buffer.endswith("\r") else ""
+            *lines, rest = LINE_END.split(self.buffer[:len(self.buffer) - len(pending)])
+            self.buffer = rest + pending
+            for line in lines:
+                self._send(line + "\n")
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self.lock:
+            if self.buffer:
+                self._send(LINE_END.sub("\n", self.buffer))
+                self.buffer = ""
+
+    def _send(self, line):
+        self._send_message((self.kind, line))
+
+    def _send_message(self, message):
+        if not self.connected:
+            return
+        try:
+            self.conn.send(message)
+        except (OSError, EOFError):
+            self.connected = False
+
+
+@contextlib.contextmanager
+def job_environment(env):
+    """任务期间临时设置环境变量，结束后恢复"""
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update({key: str(value) for key, value in env.items()})
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def preload():
+    """导入重量级依赖并加载默认检测模型，使第一个任务也不需要冷启动"""
+    start_time = time.time()
+    import run_AIGC
+    import torch
+    # football_main 的模块只在这个上下文中可见，任务之间由 run_AIGC 保存，不影响其他同名包
+    with run_AIGC.football_main_imports():
+        from trackers import load_detector
+        import team_assigner  # noqa: F401  预先导入 sklearn
+
+        # 参数与 football_main/main.py 创建 Tracker 时的默认值一致，第一个任务直接命中常驻模型
+        model_path = os.path.join(run_AIGC.FOOTBALL_MAIN_DIR, 'models', '1_unchange_better', 'best.pt')
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        try:
+            load_detector(model_path, device, resident=True)
+        except Exception as e:
+            print_debug_info(f"预加载检测模型失败，将在第一个任务中加载: {e}")
+    print_debug_info(f"worker 预加载完成，耗时 {time.time() - start_time:.2f} 秒")
+    return run_AIGC
+
+
+def run_job(run_AIGC, writer, error_writer, argv, env):
+    returncode = 0
+    start_time = time.time()
+    with job_environment(env), contextlib.redirect_stdout(writer), contextlib.redirect_stderr(error_writer):
+        try:
+            run_AIGC.main(argv, in_process_analysis=True)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            writer.close()
+            error_writer.close()
+    print_debug_info(f"任务完成，退出码 {returncode}，耗时 {time.time() - start_time:.2f} 秒")
+    return returncode
+
+
+def abort_job(writer, timeout):
+    """任务超时：通知客户端后退出整个进程，排队中的任务随连接断开由客户端重新提交"""
+    # 任务期间 stdout 被重定向到客户端，日志直接写到 worker 控制台
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[DEBUG {timestamp}] 任务超过 {timeout} 秒未完成，worker 退出", file=sys.__stdout__, flush=True)
+    # 任务线程可能正在发送输出，拿不到锁时也要退出
+    if writer.lock.acquire(timeout=5):
+        writer._send_message(("timeout", timeout))
+    os._exit(1)
+
+
+def serve(address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY):
+    """主线程接受连接并立即响应 ping，任务放入队列，由单独的线程按顺序逐个执行"""
+    run_AIGC = preload()
+    jobs = queue.Queue()
+
+    def job_loop():
+        while True:
+            conn, message = jobs.get()
+            with conn:
+                argv = [str(arg) for arg in message.get("argv", [])]
+                timeout = message.get("timeout")
+                print_debug_info(f"开始任务: {' '.join(argv)}")
+                writer = ConnectionWriter(conn)
+                error_writer = ConnectionWriter(conn, "stderr", writer.lock)
+                writer._send_message(("started", None))
+                watchdog = threading.Timer(timeout, abort_job, (writer, timeout)) if timeout else None
+                if watchdog is not None:
+                    watchdog.daemon = True
+                    watchdog.start()
+                returncode = run_job(run_AIGC, writer, error_writer, argv, message.get("env", {}))
+                if watchdog is not None:
+                    watchdog.cancel()
+                try:
+                    conn.send(("exit", returncode))
+                except (OSError, EOFError):
+                    pass
+
+    threading.Thread(target=job_loop, daemon=True).start()
+    with Listener(address, authkey=authkey) as listener:
+        print_debug_info(f"分析 worker 已启动，监听 {address[0]}:{address[1]}")
+        while True:
+            try:
+                conn = listener.accept()
+                # 不响应的客户端不能阻塞其他连接
+                message = conn.recv() if conn.poll(5) else None
+            except (OSError, EOFError):
+                continue
+            if not isinstance(message, dict):
+                conn.close()
+                continue
+            if message.get("type") == "ping":
+                with conn:
+                    conn.send(("pong", os.getpid()))
+                continue
+            try:
+                conn.send(("queued", jobs.qsize()))
+            except (OSError, EOFError):
+                conn.close()
+                continue
+            jobs.put((conn, message))
+
+
+def ping(address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY):
+    """worker 正在运行时返回其进程号，否则返回 None"""
+    try:
+        with Client(address, authkey=authkey) as conn:
+            conn.send({"type": "ping"})
+            if conn.poll(5):
+                return conn.recv()[1]
+    except (OSError, EOFError):
+        pass
+    return None
+
+
+def submit_job(argv, env=None, timeout=None, address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY):
+    """提交任务：先产出 ("queued", 前面排队的任务数)，开始执行时产出 ("started", None)，
+    然后逐个产出 ("line", 标准输出的一行) / ("stderr", 标准错误的一行)，最后产出 ("exit", 退出码)
+
+    worker 忙时任务在队列中等待，timeout 从任务开始执行时计算。超时时 worker 退出并通知客户端，
+    这里抛出 TimeoutError；worker 没能通知（超过 timeout + TIMEOUT_GRACE）时同样抛出 TimeoutError，
+    调用方应终止并重启 worker。worker 退出导致连接断开时抛出 EOFError。
+    """
+    deadline = None
+    with Client(address, authkey=authkey) as conn:
+        conn.send({"type": "job", "argv": list(argv), "env": dict(env or {}), "timeout": timeout})
+        while True:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and (remaining <= 0 or not conn.poll(remaining)):
+                raise TimeoutError("分析任务超时，worker 未响应")
+            kind, payload = conn.recv()
+            if kind == "timeout":
+                raise TimeoutError(f"分析任务超过 {payload} 秒未完成")
+            if kind == "started" and timeout:
+                deadline = time.time() + timeout + TIMEOUT_GRACE
+            yield kind, payload
+            if kind == "exit":
+                return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='常驻足球视频分析 worker')
+    parser.add_argument('--host', type=str, default=DEFAULT_ADDRESS[0])
+    parser.add_argument('--port', type=int, default=DEFAULT_ADDRESS[1])
+    args = parser.parse_args()
+    serve((args.host, args.port))
@@ -0,0 +1,85 @@
+"""标注绘制微基准：对比 ID 徽章精灵缓存开启 / 关闭时 Tracker.draw_frame_annotations 的帧率
+
+只测绘制，不加载模型、不读视频：用随机运动的合成球员轨迹在 1080p 画面上绘制。
+用法（在 football_main 目录下）:
+    python benchmarks/annotation_benchmark.py --num_frames 300 --num_players 22
+"""
+import argparse
+import numpy as np
+
+from common import print_debug_info, time_it, speedup_report
+from trackers import Tracker
+
+
+def make_tracks(num_frames, num_players, width, height, seed=0):
+    # 球员在画面中做随机游走，track_id 和 bbox 宽度在相邻帧间基本不变，与真实比赛相似
+    rs = np.random.RandomState(seed)
+    positions = rs.uniform([100, 300], [width - 100, height - 50], (num_players, 2))
+    sizes = rs.uniform(30, 90, num_players)
+    team_colors = [(0, 0, 255), (255, 255, 255)]
+    tracks = {"players": [], "referees": [], "ball": []}
+    for _ in range(num_frames):
+        positions += rs.normal(0, 3, positions.shape)
+        players = {}
+        for track_id, ((x, y), size) in enumerate(zip(positions, sizes), start=1):
+            players[track_id] = {"bbox": [x - size / 2, y - size * 2, x + size / 2, y],
+                                 "team_color": team_colors[track_id % 2]}
+        tracks["players"].append(players)
+        tracks["referees"].append({})
+        tracks["ball"].append({})
+    return tracks
+
+
+def run(tracker, frame, tracks, percentages, repeats):
+    # 每轮在同一块缓冲区上重画（先恢复底图），取多轮中最快的一轮
+    canvas = frame.copy()
+
+    def draw():
+        for frame_num in range(len(tracks["players"])):
+            np.copyto(canvas, frame)
+            tracker.draw_frame_annotations(canvas, frame_num, tracks, percentages)
+
+    return time_it(draw, repeats=repeats)[0]
+
+
+def run_badges(tracker, frame, tracks, repeats):
+    # 只计时球员椭圆 + ID 徽章的绘制
+    canvas = frame.copy()
+
+    def draw():
+        for players in tracks["players"]:
+            for track_id, player in players.items():
+                tracker.draw_ellipse(canvas, player["bbox"], player["team_color"], track_id)
+
+    return time_it(draw, repeats=repeats)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Annotation rendering micro-benchmark')
+    parser.add_argument('--num_frames', type=int, default=300)
+    parser.add_argument('--num_players', type=int, default=22)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    width, height = 1920, 1080
+    frame = np.full((height, width, 3), (40, 140, 40), dtype=np.uint8)
+    tracks = make_tracks(args.num_frames, args.num_players, width, height)
+    percentages = np.full((args.num_frames, 2), 0.5)
+
+    # 只测绘制，跳过模型加载
+    tracker = Tracker.__new__(Tracker)
+
+    results = {}
+    for cache_badges in (False, True):
+        tracker.cache_badges = cache_badges
+        results[cache_badges] = (run_badges(tracker, frame, tracks, args.repeats),
+                                 run(tracker, frame, tracks, percentages, args.repeats))
+
+    for name, index in (("椭圆+徽章", 0), ("整帧标注", 1)):
+        uncached_time, cached_time = results[False][index], results[True][index]
+        print_debug_info(f"{name} - 无缓存: {args.num_frames / uncached_time:.1f} FPS, "
+                         f"精灵缓存: {speedup_report(args.num_frames, cached_time, uncached_time, '无缓存')}")
+
+
+if __name__ == '__main__':
+    main()
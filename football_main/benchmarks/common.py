@@ -0,0 +1,66 @@
+"""基准脚本共用的路径设置、样本帧读取、计时和报告格式
+
+基准脚本在 football_main 目录下以 python benchmarks/xxx.py 运行，先 import 本模块，
+再导入 utils / trackers 等项目模块。
+"""
+import os
+import sys
+import time
+import datetime
+
+CURRENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CURRENT_DIR not in sys.path:
+    sys.path.append(CURRENT_DIR)
+
+from utils import SampledVideoReader
+
+DEFAULT_INPUT_VIDEO = os.path.join(CURRENT_DIR, 'input_videos', 'a1.mp4')
+DEFAULT_MODEL_PATH = os.path.join(CURRENT_DIR, 'models', '1_unchange_better', 'best.pt')
+
+
+def print_debug_info(message):
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[DEBUG {timestamp}] {message}")
+
+
+def add_video_arguments(parser, num_frames, model=True):
+    """添加 --input_video / --model_path / --frame_interval / --num_frames 参数"""
+    parser.add_argument('--input_video', type=str, default=DEFAULT_INPUT_VIDEO)
+    if model:
+        parser.add_argument('--model_path', type=str, default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--frame_interval', type=int, default=15)
+    parser.add_argument('--num_frames', type=int, default=num_frames)
+
+
+def load_sample_frames(input_video, frame_interval, num_frames):
+    """按帧间隔抽取视频开头最多 num_frames 帧（SampledVideoReader 的第一块）"""
+    return next(iter(SampledVideoReader(input_video, frame_interval, num_frames)), (None, []))[1]
+
+
+def time_it(func, *args, repeats=1, **kwargs):
+    """调用 func repeats 次，返回 (最快一次的秒数, 最后一次的返回值)；取最快一次以减少调度抖动的影响"""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def predict_detections(model, frames, batch_size, conf):
+    """分批检测并计时（先预热一个批次），返回 (秒数, [(xyxy, 类别)])，供 match_rate 比较"""
+    model.predict(frames[:batch_size], conf=conf, verbose=False)
+
+    def run():
+        detections = []
+        for i in range(0, len(frames), batch_size):
+            for result in model.predict(frames[i:i + batch_size], conf=conf, verbose=False):
+                detections.append((result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(int)))
+        return detections
+
+    return time_it(run)
+
+
+def speedup_report(count, elapsed, reference_elapsed, reference_name, unit="FPS"):
+    """格式化为 “xx.xx FPS, 相对 基准 加速 x.xx” 的吞吐量报告"""
+    return f"{count / elapsed:6.2f} {unit}, 相对 {reference_name} 加速 {reference_elapsed / elapsed:.2f}x"
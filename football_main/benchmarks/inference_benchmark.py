@@ -0,0 +1,47 @@
+"""对比检测模型在不同 CPU 推理后端（PyTorch / ONNX Runtime / OpenVINO）下的吞吐量和检测一致性
+
+用法（在 football_main 目录下）:
+    python benchmarks/inference_benchmark.py --input_video input_videos/a1.mp4 --num_frames 60 \
+        --backends torch onnx openvino --num_threads 4
+首次运行 onnx / openvino 会导出模型并缓存在 .pt 旁边，导出时间不计入吞吐量。
+"""
+import argparse
+
+from common import print_debug_info, add_video_arguments, load_sample_frames, predict_detections, speedup_report
+from utils import match_rate
+from trackers import load_detector, BACKENDS
+
+
+def run_backend(backend, model_path, frames, batch_size, num_threads, conf):
+    model = load_detector(model_path, backend=backend, num_threads=num_threads)
+    return predict_detections(model, frames, batch_size, conf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detector inference backend throughput benchmark')
+    add_video_arguments(parser, num_frames=60)
+    parser.add_argument('--batch_size', type=int, default=20)
+    parser.add_argument('--backends', type=str, nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--num_threads', type=int, default=None)
+    parser.add_argument('--conf', type=float, default=0.1, help='Detection confidence threshold (Tracker uses 0.1)')
+    args = parser.parse_args()
+
+    frames = load_sample_frames(args.input_video, args.frame_interval, args.num_frames)
+    print_debug_info(f"共 {len(frames)} 帧, 批大小 {args.batch_size}, 线程数 {args.num_threads or '默认'}")
+
+    results = {}
+    for backend in args.backends:
+        results[backend] = run_backend(backend, args.model_path, frames, args.batch_size, args.num_threads,
+                                       args.conf)
+
+    reference_backend = args.backends[0]
+    reference_time, reference_detections = results[reference_backend]
+    for backend, (elapsed, detections) in results.items():
+        num_boxes = sum(len(boxes) for boxes, _ in detections)
+        print_debug_info(f"{backend:9s}: {speedup_report(len(frames), elapsed, reference_time, reference_backend)}, "
+                         f"检测框 {num_boxes}, "
+                         f"与 {reference_backend} 匹配率 {match_rate(reference_detections, detections) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
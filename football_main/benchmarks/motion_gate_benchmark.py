@@ -0,0 +1,60 @@
+"""评估运动门控跳过检测的比例、耗时和对跟踪结果的影响
+
+用法（在 football_main 目录下）:
+    python benchmarks/motion_gate_benchmark.py --input_video input_videos/a1.mp4 --num_frames 120 \
+        --thresholds 1 2 4 --max_skip 4
+以不开门控（每帧检测）的跟踪结果为基准，逐帧比较球员、裁判和球的框（同类且 IoU > 0.5 视为一致）。
+"""
+import argparse
+import supervision as sv
+
+from common import print_debug_info, add_video_arguments, load_sample_frames, time_it, speedup_report
+from utils import TrackTable, match_rate
+from trackers import Tracker
+from trackers.motion_gate import MotionGate
+
+
+def frame_boxes(tracks):
+    """逐帧的 (xyxy 数组, 目标类别编码数组)，供 match_rate 比较"""
+    boxes = []
+    for frame_num in range(tracks.num_frames):
+        rows = tracks.frame_rows(frame_num)
+        boxes.append((tracks["bbox"][rows], tracks["object"][rows].astype(int)))
+    return boxes
+
+
+def run_tracking(tracker, frames, threshold, max_skip):
+    # 每次运行使用全新的 ByteTrack 和门控状态，模型复用
+    tracker.tracker = sv.ByteTrack()
+    tracker.motion_gate = MotionGate(threshold, max_skip)
+    tracker.recent_outputs = []
+    tracks = TrackTable()
+    elapsed, _ = time_it(tracker.track_frames, frames, tracks)
+    return elapsed, tracks, tracker.motion_gate.skipped_fraction
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motion-gated detection skipping benchmark')
+    add_video_arguments(parser, num_frames=120)
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[1.0, 2.0, 4.0])
+    parser.add_argument('--max_skip', type=int, default=4)
+    parser.add_argument('--batch_size', type=int, default=20)
+    args = parser.parse_args()
+
+    frames = load_sample_frames(args.input_video, args.frame_interval, args.num_frames)
+    print_debug_info(f"共 {len(frames)} 帧, 最多连续跳过 {args.max_skip} 帧")
+
+    tracker = Tracker(args.model_path, batch_size=args.batch_size)
+    reference_time, reference_tracks, _ = run_tracking(tracker, frames, 0.0, args.max_skip)
+    reference_boxes = frame_boxes(reference_tracks)
+    print_debug_info(f"不开门控: {len(frames) / reference_time:6.2f} FPS, 跟踪行数 {len(reference_tracks)}")
+
+    for threshold in args.thresholds:
+        elapsed, tracks, skipped = run_tracking(tracker, frames, threshold, args.max_skip)
+        agreement = match_rate(reference_boxes, frame_boxes(tracks))
+        print_debug_info(f"阈值 {threshold:5.2f}: 跳过 {skipped * 100:5.1f}% 帧, "
+                         f"{speedup_report(len(frames), elapsed, reference_time, '不开门控')}, 与逐帧检测的框一致率 {agreement * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
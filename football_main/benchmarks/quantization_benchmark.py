@@ -0,0 +1,71 @@
+"""对比 FP32 与 INT8 训练后量化模型的 CPU 吞吐量和精度
+
+用法（在 football_main 目录下）:
+    python benchmarks/quantization_benchmark.py --input_video input_videos/a1.mp4 --num_frames 60 \
+        --data path/to/data.yaml
+依次运行 torch fp32、openvino fp32、openvino int8，吞吐量和检测一致性都以 torch fp32 为基准。
+指定 --data（带标注的数据集 yaml）时额外用 model.val 计算 mAP 及 INT8 相对 FP32 的下降；
+越位检测的分割模型加 --task segment，同时报告 mask mAP。
+首次运行 int8 会从 --calibration_source 抽帧校准并导出模型，导出时间不计入吞吐量。
+"""
+import argparse
+
+from common import print_debug_info, add_video_arguments, load_sample_frames, predict_detections, speedup_report
+from utils import match_rate
+from trackers import load_detector
+from trackers.inference_backend import DEFAULT_CALIBRATION_SOURCE
+
+# (后端, 精度)，第一项为基准
+CONFIGURATIONS = (("torch", "fp32"), ("openvino", "fp32"), ("openvino", "int8"))
+
+
+def validate(model, data, imgsz, batch_size):
+    """返回 {指标名: mAP50-95}，分割模型同时包含 box 和 mask"""
+    metrics = model.val(data=data, imgsz=imgsz, batch=batch_size, plots=False, verbose=False)
+    scores = {"box mAP50-95": float(metrics.box.map)}
+    if hasattr(metrics, "seg"):
+        scores["mask mAP50-95"] = float(metrics.seg.map)
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FP32 vs INT8 quantized detector benchmark')
+    add_video_arguments(parser, num_frames=60)
+    parser.add_argument('--task', type=str, default='detect', choices=('detect', 'segment'))
+    parser.add_argument('--calibration_source', type=str, default=DEFAULT_CALIBRATION_SOURCE,
+                        help='Video/image directory or data.yaml used for INT8 calibration')
+    parser.add_argument('--data', type=str, default=None, help='Labelled dataset yaml for mAP evaluation')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch_size', type=int, default=20)
+    parser.add_argument('--num_threads', type=int, default=None)
+    parser.add_argument('--conf', type=float, default=0.1, help='Detection confidence threshold (Tracker uses 0.1)')
+    args = parser.parse_args()
+
+    frames = load_sample_frames(args.input_video, args.frame_interval, args.num_frames)
+    print_debug_info(f"共 {len(frames)} 帧, 批大小 {args.batch_size}, 线程数 {args.num_threads or '默认'}")
+
+    results = {}
+    for backend, precision in CONFIGURATIONS:
+        model = load_detector(args.model_path, backend=backend, num_threads=args.num_threads, imgsz=args.imgsz,
+                              precision=precision, calibration_source=args.calibration_source, task=args.task)
+        elapsed, detections = predict_detections(model, frames, args.batch_size, args.conf)
+        scores = validate(model, args.data, args.imgsz, args.batch_size) if args.data else {}
+        results[(backend, precision)] = (elapsed, detections, scores)
+
+    reference = CONFIGURATIONS[0]
+    reference_time, reference_detections, reference_scores = results[reference]
+    for (backend, precision), (elapsed, detections, scores) in results.items():
+        message = (f"{backend:9s} {precision}: {speedup_report(len(frames), elapsed, reference_time, 'torch fp32')}, "
+                   f"检测框匹配率 "
+                   f"{match_rate(reference_detections, detections) * 100:.1f}%")
+        for name, value in scores.items():
+            message += f", {name} {value:.4f} ({value - reference_scores[name]:+.4f})"
+        print_debug_info(message)
+
+    int8_time = results[("openvino", "int8")][0]
+    fp32_time = results[("openvino", "fp32")][0]
+    print_debug_info(f"INT8 相对 OpenVINO FP32 加速 {fp32_time / int8_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""对比 TeamAssigner 两种球衣取色方式（批量 mask_mean 与逐球员 KMeans）的速度和一致性
+
+用法（在 football_main 目录下）:
+    python benchmarks/team_assigner_benchmark.py --input_video input_videos/a1.mp4 --num_frames 20
+"""
+import argparse
+import numpy as np
+
+from common import print_debug_info, add_video_arguments, load_sample_frames, time_it, speedup_report
+from utils import TrackTable
+from trackers import Tracker
+from team_assigner import TeamAssigner
+
+
+def load_frames_and_players(input_video, frame_interval, num_frames, model_path):
+    frames = load_sample_frames(input_video, frame_interval, num_frames)
+    tracker = Tracker(model_path=model_path)
+    tracks = TrackTable()
+    tracker.track_frames(frames, tracks)
+    player_bboxes = [tracks['bbox'][tracks.object_rows("players", tracks.frame_rows(frame_num))]
+                     for frame_num in range(len(frames))]
+    return frames, player_bboxes
+
+
+def run_method(color_method, frames, player_bboxes):
+    team_assigner = TeamAssigner(color_method=color_method)
+    team_assigner.assign_team_color(frames[0], {i: {"bbox": bbox} for i, bbox in enumerate(player_bboxes[0])})
+
+    elapsed, colors = time_it(lambda: [team_assigner.get_player_colors(frame, bboxes)
+                                       for frame, bboxes in zip(frames, player_bboxes)])
+
+    teams = np.concatenate([team_assigner.kmeans.predict(c) + 1 for c in colors if len(c)])
+    return elapsed, teams
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TeamAssigner colour extraction benchmark')
+    add_video_arguments(parser, num_frames=20)
+    args = parser.parse_args()
+
+    frames, player_bboxes = load_frames_and_players(args.input_video, args.frame_interval,
+                                                    args.num_frames, args.model_path)
+    num_players = sum(len(bboxes) for bboxes in player_bboxes)
+    print_debug_info(f"共 {len(frames)} 帧, {num_players} 个球员检测")
+
+    kmeans_time, kmeans_teams = run_method("kmeans", frames, player_bboxes)
+    fast_time, fast_teams = run_method("mask_mean", frames, player_bboxes)
+
+    # 两种方法的队伍编号可能互换，取两种对应方式中一致率更高的一种
+    agreement = np.mean(kmeans_teams == fast_teams)
+    agreement = max(agreement, 1 - agreement)
+
+    print_debug_info(f"kmeans:    {kmeans_time:.3f} 秒, {num_players / kmeans_time:.1f} 球员/秒")
+    print_debug_info(f"mask_mean: {fast_time:.3f} 秒, "
+                     f"{speedup_report(num_players, fast_time, kmeans_time, 'kmeans', unit='球员/秒')}")
+    print_debug_info(f"队伍分配一致率: {agreement * 100:.2f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,24 +2,101 @@ import pickle
 import cv2
 import numpy as np
 import os
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 import sys 
 sys.path.append('../')
-from utils import measure_distance,measure_xy_distance
+from utils import blend_rectangle, save_npz, load_npz, npz_path
+
+
+def _open_at(video_path, frame_num):
+    """打开视频并定位到 frame_num，返回 (cap, 实际所在帧号)
+
+    CAP_PROP_POS_FRAMES 定位不是在所有编码上都精确：定位失败或读回的位置与目标不一致时
+    重新打开视频，从第 0 帧开始，由调用方逐帧 grab 到目标帧。
+    """
+    cap = cv2.VideoCapture(video_path)
+    if frame_num <= 0:
+        return cap, 0
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num) and int(round(cap.get(cv2.CAP_PROP_POS_FRAMES))) == frame_num:
+        return cap, frame_num
+    cap.release()
+    return cv2.VideoCapture(video_path), 0
+
+def _estimate_chunk(video_path, frame_indices, overlap_frame, options):
+    """进程池任务：独立打开视频，估计 frame_indices（升序的原视频帧号）这些帧的相机运动
+
+    overlap_frame 为前一块的最后一帧（第一块为 None）。从这一帧开始读，在块边界上
+    用新检测的特征点重新估计一次运动，把各块拼接起来；这一帧本身的结果丢弃。
+    """
+    cv2.setNumThreads(1)  # 并行在进程级完成，避免每个进程再开满 OpenCV 线程
+    wanted = list(frame_indices) if overlap_frame is None else [overlap_frame] + list(frame_indices)
+    camera_movement = []
+    cap, frame_num = _open_at(video_path, wanted[0])
+    try:
+        camera_movement_estimator = None
+        for target in wanted:
+            # 跳过的帧只 grab 不解码
+            while frame_num < target and cap.grab():
+                frame_num += 1
+            if frame_num != target or not cap.grab():
+                break
+            frame_num += 1
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            if camera_movement_estimator is None:
+                camera_movement_estimator = CameraMovementEstimator(frame, **options)
+            camera_movement += camera_movement_estimator.update([frame])
+    finally:
+        cap.release()
+
+    if overlap_frame is not None:
+        camera_movement = camera_movement[1:]
+    # 读取失败的帧与串行版本一样记为没有运动
+    camera_movement += [[0,0]] * (len(frame_indices) - len(camera_movement))
+    return camera_movement
 
 class CameraMovementEstimator():
-    def __init__(self,frame):
-        self.minimum_distance = 5 #最小移动阈值
+    # 由特征点位移估计相机运动的方法：
+    # max: 取位移最大的特征点（原始做法）；median: 所有成功跟踪点位移的中位数；
+    # ransac: RANSAC 拟合相似变换，剔除在场边移动的球员等外点
+    ESTIMATORS = ("max", "median", "ransac")
+    # 特征点重检测策略：
+    # motion: 记录到相机运动时重检测（原始做法）；count: 成功跟踪的特征点少于 min_features 时才重检测，
+    #         否则沿用光流跟踪到的新位置
+    REDETECT_POLICIES = ("motion", "count")
+    # 特征点检测区域：画面宽度的比例区间 (起, 止)，原实现针对 1920 宽画面的第 0-20 列和 900-1050 列
+    DEFAULT_MASK_REGIONS = ((0.0, 20 / 1920), (900 / 1920, 1050 / 1920))
+    # 相机运动结果的版本号，参与阶段缓存键；估计算法或常量修改后递增，使旧缓存失效
+    RESULT_VERSION = 1
+
+    def __init__(self,frame,downscale=1.0,estimator="max",mask_regions=DEFAULT_MASK_REGIONS,
+                 redetect="motion",min_features=10):
+        if estimator not in self.ESTIMATORS:
+            raise ValueError(f"未知的相机运动估计方法: {estimator}，可选 {self.ESTIMATORS}")
+        if redetect not in self.REDETECT_POLICIES:
+            raise ValueError(f"未知的特征点重检测策略: {redetect}，可选 {self.REDETECT_POLICIES}")
+        self.minimum_distance = 5 #最小移动阈值（原分辨率像素）
+        # 光流在缩小 downscale 倍的灰度图上计算，位移再换算回原分辨率
+        self.downscale = downscale
+        self.estimator = estimator
+        self.mask_regions = tuple(tuple(region) for region in mask_regions)
+        self.redetect = redetect
+        self.min_features = min_features
         # Lucas-Kanade光流法参数
         self.lk_params = dict(
             winSize = (15,15),  #搜索窗口大小
             maxLevel = 2,       #金字塔层数
             criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT,10,0.03)
         )
-        # 创建特征点检测掩码（只检测两侧区域）
-        first_frame_grayscale = cv2.cvtColor(frame,cv2.COLOR_BGR2GRAY)
+        # 创建特征点检测掩码（只检测指定的纵向区域），按比例换算到光流计算所用的分辨率
+        first_frame_grayscale = self._to_gray(frame)
         mask_features = np.zeros_like(first_frame_grayscale)
-        mask_features[:,0:20] = 1       # 左侧区域
-        mask_features[:,900:1050] = 1   # 右侧区域
+        width = mask_features.shape[1]
+        for start, end in self.mask_regions:
+            mask_features[:,int(round(start * width)):int(round(end * width))] = 1
         # 特征点检测参数
         self.features = dict(
             maxCorners = 100,  # 最大特征点数
@@ -28,79 +105,176 @@ class CameraMovementEstimator():
             blockSize = 7,  # 计算窗口大小
             mask = mask_features  # 应用区域掩码
         )
+        self.reset()
     # 相机运动补偿
     def add_adjust_positions_to_tracks(self,tracks, camera_movement_per_frame):
-        for object, object_tracks in tracks.items():
-            for frame_num, track in enumerate(object_tracks):
-                for track_id, track_info in track.items():
-                    position = track_info['position']
-                    # 获取当前帧的相机运动
-                    camera_movement = camera_movement_per_frame[frame_num]
-                    # 计算补偿后的位置
-                    position_adjusted = (position[0]-camera_movement[0],position[1]-camera_movement[1])
-                    tracks[object][frame_num][track_id]['position_adjusted'] = position_adjusted
-                    
+        # 按每行所在帧取相机运动，整表一次计算补偿后的位置
+        camera_movement = np.asarray(camera_movement_per_frame, dtype=np.float32).reshape(-1, 2)
+        tracks["position_adjusted"] = tracks["position"] - camera_movement[tracks["frame"]]
 
+    def options(self):
+        """构造参数（不含首帧），用于在其他进程中创建相同配置的估计器"""
+        return dict(downscale=self.downscale, estimator=self.estimator, mask_regions=self.mask_regions,
+                    redetect=self.redetect, min_features=self.min_features)
 
-    def get_camera_movement(self,frames,read_from_stub=False, stub_path=None):
-        # 缓存
-        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
-            with open(stub_path,'rb') as f:
-                return pickle.load(f)
+    def _to_gray(self, frame):
+        gray = cv2.cvtColor(frame,cv2.COLOR_BGR2GRAY)
+        if self.downscale != 1.0:
+            height, width = gray.shape
+            size = (max(1, int(round(width * self.downscale))), max(1, int(round(height * self.downscale))))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def estimate_movement(self, old_features, new_features, status=None):
+        """由一组特征点的前后位置估计相机运动，返回 (位移大小, (x, y) 运动)，单位为原分辨率像素
+
+        运动方向与原实现一致：旧位置减新位置。max 方法的位移大小是最大特征点位移，
+        稳健方法是估计出的运动本身的大小，调用方用它和 minimum_distance 比较。
+        """
+        old_points = old_features.reshape(-1, 2) / self.downscale
+        new_points = new_features.reshape(-1, 2) / self.downscale
+        displacement = old_points - new_points
+
+        if self.estimator == "max":
+            if len(displacement) == 0:
+                return 0.0, (0, 0)
+            # 一次 argmax 找出位移最大的点，取代逐点调用 measure_distance 的循环
+            distances = np.hypot(displacement[:, 0], displacement[:, 1])
+            max_index = int(np.argmax(distances))
+            return float(distances[max_index]), tuple(displacement[max_index].tolist())
 
+        # 稳健估计只使用光流跟踪成功的点
+        if status is not None:
+            tracked = status.reshape(-1).astype(bool)
+            old_points, new_points, displacement = old_points[tracked], new_points[tracked], displacement[tracked]
+        if len(displacement) == 0:
+            return 0.0, (0, 0)
+
+        movement = None
+        if self.estimator == "ransac" and len(displacement) >= 3:
+            matrix, _ = cv2.estimateAffinePartial2D(old_points, new_points, method=cv2.RANSAC,
+                                                    ransacReprojThreshold=1.0)
+            if matrix is not None:
+                # 取特征点中心处的位移作为相机平移
+                center = old_points.mean(axis=0)
+                movement = center - (matrix[:, :2] @ center + matrix[:, 2])
+        if movement is None:
+            movement = np.median(displacement, axis=0)
+        return float(np.hypot(movement[0], movement[1])), tuple(movement.tolist())
+
+    def reset(self):
+        """清空流式估计的状态，下一次 update 从新的视频开始"""
+        self.old_gray = None
+        self.old_features = None
+
+    def update(self,frames):
+        """流式估计：处理一段连续帧，返回这些帧的相机运动；光流状态跨调用保留"""
         camera_movement = [[0,0]]*len(frames)  # 初始化运动向量
-        # 处理第一帧
-        old_gray = cv2.cvtColor(frames[0],cv2.COLOR_BGR2GRAY)
-        old_features = cv2.goodFeaturesToTrack(old_gray,**self.features)
+        if len(frames) == 0:
+            return camera_movement
+
+        start = 0
+        if self.old_gray is None:
+            # 处理第一帧
+            self.old_gray = self._to_gray(frames[0])
+            self.old_features = cv2.goodFeaturesToTrack(self.old_gray,**self.features)
+            start = 1
+        old_gray = self.old_gray
+        old_features = self.old_features
 
-        for frame_num in range(1,len(frames)):
-            frame_gray = cv2.cvtColor(frames[frame_num],cv2.COLOR_BGR2GRAY)
+        for frame_num in range(start,len(frames)):
+            frame_gray = self._to_gray(frames[frame_num])
+            if old_features is None:
+                # 上一帧没有检测到特征点，直接在当前帧重新检测
+                old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
+                old_gray = frame_gray
+                continue
             # 计算光流
-            new_features, _,_ = cv2.calcOpticalFlowPyrLK(old_gray,frame_gray,old_features,None,**self.lk_params)
-
-            max_distance = 0
-            camera_movement_x, camera_movement_y = 0,0
-            # 寻找最大移动的特征点
-            for i, (new,old) in enumerate(zip(new_features,old_features)):
-                new_features_point = new.ravel()
-                old_features_point = old.ravel()
-
-                distance = measure_distance(new_features_point,old_features_point)
-                if distance>max_distance:
-                    max_distance = distance
-                    # 计算XY方向位移
-                    camera_movement_x,camera_movement_y = measure_xy_distance(old_features_point, new_features_point )
+            new_features, status,_ = cv2.calcOpticalFlowPyrLK(old_gray,frame_gray,old_features,None,**self.lk_params)
+
+            # 所有特征点的位移一次性计算
+            distance, (camera_movement_x, camera_movement_y) = self.estimate_movement(
+                old_features, new_features, status)
             # 超过阈值则记录为相机运动
-            if max_distance > self.minimum_distance:
+            if distance > self.minimum_distance:
                 camera_movement[frame_num] = [camera_movement_x,camera_movement_y]
-                # 更新特征点（重检测）
-                old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
+                if self.redetect == "motion":
+                    # 更新特征点（重检测）
+                    old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
+            if self.redetect == "count":
+                # 跟踪成功的特征点足够时沿用其新位置，不足时才重新检测
+                tracked = new_features[status.reshape(-1) == 1]
+                if len(tracked) < self.min_features:
+                    old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
+                else:
+                    old_features = tracked
+
+            old_gray = frame_gray
+
+        self.old_gray = old_gray
+        self.old_features = old_features
+        return camera_movement
+
+    def get_camera_movement(self,frames,read_from_stub=False, stub_path=None):
+        # 缓存写到同名的 .npz；stub_path 本身（例如 .pkl）只用于读取旧版缓存
+        if read_from_stub and stub_path is not None and os.path.exists(npz_path(stub_path)):
+            return load_npz(npz_path(stub_path), mmap=False)["camera_movement"].tolist()
+        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
+            if zipfile.is_zipfile(stub_path):
+                return load_npz(stub_path, mmap=False)["camera_movement"].tolist()
+            # 兼容旧版 pickle 缓存
+            with open(stub_path,'rb') as f:
+                return pickle.load(f)
+
+        self.reset()
+        camera_movement = self.update(frames)
 
-            old_gray = frame_gray.copy()
-        
         if stub_path is not None:
-            with open(stub_path,'wb') as f:
-                pickle.dump(camera_movement,f)
+            save_npz(npz_path(stub_path), {"camera_movement": np.asarray(camera_movement, dtype=np.float32).reshape(-1, 2)})
 
         return camera_movement
     
-    def draw_camera_movement(self,frames, camera_movement_per_frame):
-        output_frames=[]
+    def get_camera_movement_parallel(self,video_path,frame_indices,num_workers=None,chunk_length=256):
+        """把视频按 chunk_length 个处理帧切块，在进程池中并行估计相机运动
 
-        for frame_num, frame in enumerate(frames):
-            import cv2
+        frame_indices 为参与估计的原视频帧号（升序，例如按帧间隔抽取的帧）。相邻块重叠一帧，
+        每块从上一块的最后一帧开始读，边界处的运动在块内重新估计，因此结果按顺序直接拼接。
+        与串行版本的区别只在块边界：特征点在边界处会重新检测。
+        """
+        frame_indices = [int(i) for i in frame_indices]
+        if not frame_indices:
+            return []
+        num_workers = num_workers or os.cpu_count() or 1
+        chunk_length = max(1, int(chunk_length))
+        chunks = [frame_indices[start:start + chunk_length]
+                  for start in range(0, len(frame_indices), chunk_length)]
+        overlaps = [None] + [chunk[-1] for chunk in chunks[:-1]]
 
-            frame= frame.copy()
-            # 半透明背景
-            overlay = frame.copy()
-            cv2.rectangle(overlay,(0,0),(500,100),(255,255,255),-1)
-            alpha =0.6
-            cv2.addWeighted(overlay,alpha,frame,1-alpha,0,frame)
-            # 运动信息文本
-            x_movement, y_movement = camera_movement_per_frame[frame_num]
-            frame = cv2.putText(frame,f"Camera Movement X: {x_movement:.2f}",(10,30), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
-            frame = cv2.putText(frame,f"Camera Movement Y: {y_movement:.2f}",(10,60), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+        # 使用 spawn 启动子进程，避免在已加载 torch 等多线程库的进程中 fork
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(chunks)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_estimate_chunk, video_path, chunk, overlap, self.options())
+                       for chunk, overlap in zip(chunks, overlaps)]
+            camera_movement = []
+            for future in futures:
+                camera_movement += future.result()
+        return camera_movement
+
+    def draw_frame_camera_movement(self,frame,frame_num,camera_movement_per_frame):
+        """在单帧上原地绘制相机运动面板，可注册到 FrameRenderer"""
+        # 半透明背景，只混合面板区域
+        blend_rectangle(frame,(0,0),(500,100),(255,255,255),0.6)
+        # 运动信息文本
+        x_movement, y_movement = camera_movement_per_frame[frame_num]
+        frame = cv2.putText(frame,f"Camera Movement X: {x_movement:.2f}",(10,30), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+        frame = cv2.putText(frame,f"Camera Movement Y: {y_movement:.2f}",(10,60), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+        return frame
+
+    def draw_camera_movement(self,frames, camera_movement_per_frame,frame_offset=0):
+        output_frames=[]
 
+        for frame_num, frame in enumerate(frames, start=frame_offset):
+            frame = self.draw_frame_camera_movement(frame.copy(), frame_num, camera_movement_per_frame)
             output_frames.append(frame) 
 
-        return output_frames
\ No newline at end of file
+        return output_frames
@@ -4,9 +4,9 @@ import threading
 import argparse
 import datetime
 import time
-from tqdm import tqdm
-from utils import read_video, save_video
-from trackers import Tracker
+from utils import read_video_chunks, SampledVideoReader, open_video_writer, KeyframeTimeline, threaded_map, prefetch, TrackTable, FrameRenderer, StageCache, file_hash
+from trackers import Tracker, BACKENDS as INFERENCE_BACKENDS, PRECISIONS as INFERENCE_PRECISIONS, IMGSZ_OPTIONS as TUNING_IMGSZ_OPTIONS
+from trackers.batch_tuner import tuning_key, load_tuning
 import cv2
 import numpy as np
 from team_assigner import TeamAssigner
@@ -33,7 +33,27 @@ def print_debug_info(message):
     print(f"[DEBUG {timestamp}] {message}")
 
 
-def main():
+def cached_tracks_imgsz(args, model_path, frame_shape):
+    """不加载模型就能确定的推理尺寸，用于在创建 Tracker 之前查找跟踪缓存
+
+    --autotune 时取本机已保存的调优结果；还没有调优结果（或 --retune）时依次尝试各候选尺寸，
+    缓存中的结果都来自通过了与基准尺寸一致性检查的尺寸。
+    """
+    if args.tiled:
+        # 分块推理的推理尺寸不参与调优，与 Tracker 一致默认取 tile 边长
+        return [args.imgsz or args.tile_size]
+    if not args.autotune:
+        return [args.imgsz]
+    if not args.retune:
+        settings = load_tuning(args.tuning_file, tuning_key(model_path, args.backend, args.precision,
+                                                            frame_shape, args.autotune_imgsz))
+        if settings is not None:
+            return [settings["imgsz"]]
+    return list(args.autotune_imgsz)
+
+
+def main(argv=None, resident_models=False):
+    """argv 为 None 时解析命令行；resident_models=True 时复用本进程中已加载的检测模型（常驻 worker 调用）"""
     print_debug_info("开始足球视频分析流程")
     start_time = time.time()
     
@@ -43,27 +63,77 @@ def main():
                         help='Path to the input video file')
     parser.add_argument('--frame_interval', type=int, default=15,
                         help='Frame interval for processing')
-    args = parser.parse_args()
+    parser.add_argument('--track_fill', type=str, default='interpolate', choices=['interpolate', 'hold'],
+                        help='How to fill frames skipped by frame_interval: interpolate bboxes or hold the previous keyframe')
+    parser.add_argument('--team_color_method', type=str, default='mask_mean', choices=TeamAssigner.COLOR_METHODS,
+                        help='Jersey colour extraction: batched masked mean (fast) or per-player KMeans')
+    parser.add_argument('--chunk_size', type=int, default=64,
+                        help='Number of frames held in memory at once while streaming the video')
+    parser.add_argument('--pipeline_depth', type=int, default=2,
+                        help='Number of chunks buffered between pipeline stages (decode/detect/track/draw/write)')
+    parser.add_argument('--camera_downscale', type=float, default=1.0,
+                        help='Scale factor applied to frames before camera-motion optical flow (e.g. 0.5)')
+    parser.add_argument('--camera_estimator', type=str, default='max', choices=CameraMovementEstimator.ESTIMATORS,
+                        help='Camera motion from feature displacements: largest mover (original), median or RANSAC')
+    parser.add_argument('--camera_redetect', type=str, default='motion', choices=CameraMovementEstimator.REDETECT_POLICIES,
+                        help='Re-detect camera features after every recorded movement (original) or only when too few are still tracked')
+    parser.add_argument('--camera_workers', type=int, default=1,
+                        help='Processes for camera-motion estimation; >1 estimates overlapping chunks of the video in parallel')
+    parser.add_argument('--camera_chunk_length', type=int, default=256,
+                        help='Processed frames per parallel camera-motion chunk')
+    parser.add_argument('--cache_dir', type=str, default=os.path.join(CURRENT_DIR, 'stubs', 'stage_cache'),
+                        help='Directory of the content-addressed stage cache (tracks, camera movement)')
+    parser.add_argument('--no_cache', action='store_true',
+                        help='Disable the stage cache and recompute every stage')
+    parser.add_argument('--ball_max_gap', type=int, default=None,
+                        help='Do not interpolate ball gaps longer than this many processed frames (default: fill every gap)')
+    parser.add_argument('--ball_smoothing', action='store_true',
+                        help='Smooth the ball trajectory with a constant-velocity Kalman/RTS smoother')
+    parser.add_argument('--backend', type=str, default='torch', choices=INFERENCE_BACKENDS,
+                        help='Detector runtime: PyTorch, or ONNX Runtime / OpenVINO on a model exported once next to the .pt')
+    parser.add_argument('--precision', type=str, default='fp32', choices=INFERENCE_PRECISIONS,
+                        help='Detector precision; int8 needs --backend openvino and is calibrated on frames from input_videos')
+    parser.add_argument('--num_threads', type=int, default=None,
+                        help='Intra-op threads for the detector runtime (default: runtime decides)')
+    parser.add_argument('--batch_size', type=int, default=20,
+                        help='Frames per detector batch (halved and retried automatically when a batch fails)')
+    parser.add_argument('--imgsz', type=int, default=None,
+                        help='Detector inference size (default: the model\'s own size)')
+    parser.add_argument('--autotune', action='store_true',
+                        help='Probe RAM and batch latency to pick --batch_size/--imgsz; the result is saved per host')
+    parser.add_argument('--autotune_imgsz', type=int, nargs='+', default=list(TUNING_IMGSZ_OPTIONS),
+                        help='Inference sizes tried by --autotune; the first is the accuracy reference')
+    parser.add_argument('--autotune_samples', type=int, default=8,
+                        help='Processed frames sampled from the video for --autotune')
+    parser.add_argument('--tuning_file', type=str, default=os.path.join(CURRENT_DIR, 'stubs', 'inference_tuning.json'),
+                        help='Where --autotune results are stored, keyed by host, weights, backend and frame size')
+    parser.add_argument('--retune', action='store_true',
+                        help='Ignore a saved --autotune result and probe again')
+    parser.add_argument('--motion_threshold', type=float, default=0.0,
+                        help='Skip detection on frames whose mean grey-level change since the last detected frame is below this (0-255; 0 disables)')
+    parser.add_argument('--motion_max_skip', type=int, default=4,
+                        help='Run detection at least once every this many consecutive gated frames')
+    parser.add_argument('--ball_roi', action='store_true',
+                        help='When the full-frame pass misses the ball, search a full-resolution crop around its Kalman-predicted position')
+    parser.add_argument('--ball_crop_size', type=int, default=320,
+                        help='Side length in pixels of the --ball_roi search crop')
+    parser.add_argument('--tiled', action='store_true',
+                        help='SAHI-style inference: detect on the full frame plus overlapping full-resolution tiles, skipping grass-only tiles')
+    parser.add_argument('--tile_size', type=int, default=640,
+                        help='Side length in pixels of --tiled tiles')
+    parser.add_argument('--tile_overlap', type=float, default=0.2,
+                        help='Fractional overlap between neighbouring --tiled tiles')
+    args = parser.parse_args(argv)
     
     print_debug_info(f"使用视频文件: {args.input_video}")
     print_debug_info(f"帧间隔设置: {args.frame_interval}")
     
-    # Read Video
-    video_frames = read_video(args.input_video)
-    
-    # 根据帧间隔参数过滤帧
-    if args.frame_interval > 1:
-        print_debug_info(f"使用帧间隔 {args.frame_interval} 处理视频")
-        # 创建处理帧的索引列表
-        processed_frame_indices = list(range(0, len(video_frames), args.frame_interval))
-        # 获取要处理的帧
-        processed_frames = [video_frames[i] for i in processed_frame_indices]
-        print_debug_info(f"从 {len(video_frames)} 帧中选择了 {len(processed_frames)} 帧进行处理")
-    else:
-        print_debug_info("处理所有视频帧")
-        processed_frames = video_frames
-        processed_frame_indices = list(range(len(video_frames)))
-
+    # 按帧间隔读取：跳过的帧只 grab 不解码
+    video_reader = SampledVideoReader(args.input_video, args.frame_interval, args.chunk_size)
+    print_debug_info(f"视频信息 - 帧数: {video_reader.frame_count}, FPS: {video_reader.fps:.2f}, "
+                     f"分辨率: {video_reader.width}x{video_reader.height}")
+    # 部分容器不报告 FPS，沿用原来的 24 帧
+    video_fps = video_reader.fps if video_reader.fps > 0 else 24
 
     # tracker = Tracker('models/1_unchange_better/best.pt')
     # 使用绝对路径加载模型，避免相对路径问题
@@ -71,25 +141,157 @@ def main():
     device = 'cuda' if torch.cuda.is_available() else 'cpu'
     print_debug_info(f"使用设备: {device}")
     
-    print_debug_info("初始化跟踪器...")
-    tracker = Tracker(model_path=os.path.join(CURRENT_DIR, 'models', '1_unchange_better', 'best.pt'), device=device)
-    
-    print_debug_info("开始获取对象跟踪信息...")
-    tracks = tracker.get_object_tracks(processed_frames,
-                                       read_from_stub=False,
-                                       stub_path='stubs/track_stubs.pkl')
-    
+    model_path = os.path.join(CURRENT_DIR, 'models', '1_unchange_better', 'best.pt')
+
+    if args.frame_interval > 1:
+        print_debug_info(f"使用帧间隔 {args.frame_interval} 处理视频")
+    else:
+        print_debug_info("处理所有视频帧")
+
+    # 阶段缓存：按视频内容、帧间隔、模型权重和阶段参数寻址，同一视频再次分析时跳过检测
+    stage_cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+    video_hash = file_hash(args.input_video) if stage_cache.enabled else None
+    weights_hash = file_hash(model_path) if stage_cache.enabled else None
+
+    def tracks_cache_key(imgsz):
+        return stage_cache.key("tracks", version=Tracker.RESULT_VERSION, video=video_hash,
+                               frame_interval=args.frame_interval, weights=weights_hash, device=device,
+                               backend=args.backend, precision=args.precision, imgsz=imgsz,
+                               motion_threshold=args.motion_threshold,
+                               motion_max_skip=args.motion_max_skip if args.motion_threshold > 0 else None,
+                               ball_crop_size=args.ball_crop_size if args.ball_roi else None,
+                               tiles=(args.tile_size, args.tile_overlap) if args.tiled else None,
+                               team_color_method=args.team_color_method)
+
+    camera_key = stage_cache.key("camera_movement", version=CameraMovementEstimator.RESULT_VERSION,
+                                 video=video_hash, frame_interval=args.frame_interval,
+                                 downscale=args.camera_downscale, estimator=args.camera_estimator,
+                                 redetect=args.camera_redetect,
+                                 chunk_length=args.camera_chunk_length if args.camera_workers > 1 else None)
+    cached_tracks = None
+    if stage_cache.enabled:
+        # 先查跟踪缓存，命中时不加载检测模型、不做自动调优
+        for imgsz in cached_tracks_imgsz(args, model_path, (video_reader.height, video_reader.width)):
+            tracks_key = tracks_cache_key(imgsz)
+            cached_tracks = stage_cache.load("tracks", tracks_key)
+            if cached_tracks is not None:
+                break
+    cached_camera = stage_cache.load("camera_movement", camera_key)
+
+    if cached_tracks is not None:
+        # 只用于插值、统计和绘制
+        tracker = Tracker(model_path=None)
+    else:
+        print_debug_info("初始化跟踪器...")
+        tracker = Tracker(model_path=model_path, device=device, backend=args.backend,
+                          num_threads=args.num_threads, precision=args.precision,
+                          batch_size=args.batch_size, imgsz=args.imgsz,
+                          motion_threshold=args.motion_threshold, motion_max_skip=args.motion_max_skip,
+                          ball_roi=args.ball_roi, ball_crop_size=args.ball_crop_size,
+                          tiled=args.tiled, tile_size=args.tile_size, tile_overlap=args.tile_overlap,
+                          resident=resident_models)
+        if args.autotune:
+            # 用视频开头的若干处理帧探测；同一主机再次运行时直接读取保存的结果
+            sample_frames = next(iter(SampledVideoReader(args.input_video, args.frame_interval, args.autotune_samples)),
+                                 (None, []))[1]
+            if sample_frames:
+                tracker.autotune(sample_frames, args.tuning_file, args.autotune_imgsz, retune=args.retune)
+        tracks_key = tracks_cache_key(tracker.imgsz)
+
+    camera_movement_per_frame = []
+    camera_movement_estimator = None
+    if cached_tracks is not None:
+        print_debug_info(f"命中跟踪缓存: {stage_cache.path('tracks', tracks_key)}，跳过检测与跟踪")
+        tracks = TrackTable.from_arrays(cached_tracks)
+        processed_frame_indices = cached_tracks["frame_indices"].tolist()
+        total_video_frames = int(cached_tracks["frames_read"])
+    else:
+        # 第一遍：分块流式读取视频，完成所有需要像素的步骤（检测、跟踪、相机运动、队伍分配）
+        # 只保留轻量的跟踪数据，峰值内存只与 chunk_size 有关，与视频长度无关
+        tracks = TrackTable()
+        processed_frame_indices = []
+        team_assigner = TeamAssigner(color_method=args.team_color_method)
+        # 相机运动没有缓存且串行估计时，在帧仍驻留内存时顺带计算
+        estimate_camera_inline = cached_camera is None and args.camera_workers <= 1
+
+        # 解码、YOLO 检测、ByteTrack 跟踪以流水线方式在不同线程上并发执行
+        print_debug_info("开始获取对象跟踪信息...")
+        for chunk_indices, processed_frames, first_frame_num in tracker.track_chunks(video_reader, tracks,
+                                                                                     args.pipeline_depth):
+            if camera_movement_estimator is None:
+                print_debug_info("初始化摄像头移动估计器...")
+                camera_movement_estimator = CameraMovementEstimator(processed_frames[0],
+                                                                    args.camera_downscale,
+                                                                    args.camera_estimator,
+                                                                    redetect=args.camera_redetect)
+
+            if estimate_camera_inline:
+                camera_movement_per_frame += camera_movement_estimator.update(processed_frames)
+
+            # 队伍分配需要球员像素，在当前块仍驻留内存时完成
+            if not team_assigner.team_colors:
+                print_debug_info("分配队伍颜色...")
+                team_assigner.assign_team_color(processed_frames[0],
+                                                tracks.as_tracks()['players'][first_frame_num])
+
+            # 每帧所有球员一次批量取色、一次预测队伍
+            for offset, frame in enumerate(processed_frames):
+                player_rows = tracks.object_rows("players", tracks.frame_rows(first_frame_num + offset))
+                if len(player_rows) == 0:
+                    continue
+                teams = team_assigner.get_player_teams(frame,
+                                                       tracks['bbox'][player_rows],
+                                                       tracks['track_id'][player_rows].tolist())
+                tracks['team'][player_rows] = teams
+                tracks['team_color'][player_rows] = [team_assigner.team_colors[team] for team in teams]
+
+            processed_frame_indices += chunk_indices
+
+        total_video_frames = video_reader.frames_read
+        if tracker.motion_gate.enabled:
+            print_debug_info(f"运动门控跳过检测 {tracker.motion_gate.frames_skipped}/{tracker.motion_gate.frames_seen} 帧 "
+                             f"({tracker.motion_gate.skipped_fraction * 100:.1f}%)")
+        if tracker.tiled_detector is not None:
+            print_debug_info(f"分块推理跳过纯草地 tile {tracker.tiled_detector.tiles_skipped}/{tracker.tiled_detector.tiles_total} "
+                             f"({tracker.tiled_detector.skipped_fraction * 100:.1f}%)")
+        if tracker.ball_detector is not None:
+            print_debug_info(f"球 ROI 搜索 {tracker.ball_detector.roi_searches} 次，补回 {tracker.ball_detector.roi_hits} 帧的球")
+        if processed_frame_indices:
+            stage_cache.save("tracks", tracks_key, {**tracks.to_arrays(),
+                                                    "frame_indices": np.asarray(processed_frame_indices),
+                                                    "frames_read": np.asarray(total_video_frames)})
+
+    if not processed_frame_indices:
+        print_debug_info(f"错误：未能从视频中读取任何帧: {args.input_video}")
+        return
+    print_debug_info(f"从 {total_video_frames} 帧中选择了 {len(processed_frame_indices)} 帧进行处理")
+
+    if camera_movement_estimator is None:
+        # 跳过了第一遍，估计器只需要画面尺寸来生成特征点掩码
+        camera_movement_estimator = CameraMovementEstimator(np.zeros((video_reader.height, video_reader.width, 3),
+                                                                     dtype=np.uint8),
+                                                            args.camera_downscale,
+                                                            args.camera_estimator,
+                                                            redetect=args.camera_redetect)
+    if cached_camera is not None and len(cached_camera["camera_movement"]) == len(processed_frame_indices):
+        print_debug_info(f"命中摄像头移动缓存: {stage_cache.path('camera_movement', camera_key)}")
+        camera_movement_per_frame = cached_camera["camera_movement"].tolist()
+    else:
+        if len(camera_movement_per_frame) != len(processed_frame_indices):
+            # 串行模式下整段视频作为一个块，结果与逐块 update 相同
+            parallel = args.camera_workers > 1
+            print_debug_info(f"使用 {max(args.camera_workers, 1)} 个进程估计摄像头移动...")
+            camera_movement_per_frame = camera_movement_estimator.get_camera_movement_parallel(
+                args.input_video, processed_frame_indices, max(args.camera_workers, 1),
+                args.camera_chunk_length if parallel else len(processed_frame_indices))
+        # 帧数不符的旧缓存仍被内存映射，覆盖同一个缓存文件前先释放
+        cached_camera = None
+        stage_cache.save("camera_movement", camera_key,
+                         {"camera_movement": np.asarray(camera_movement_per_frame, dtype=np.float32).reshape(-1, 2)})
+
     print_debug_info("添加位置信息到跟踪数据...")
     tracker.add_position_to_tracks(tracks)
 
-    print_debug_info("初始化摄像头移动估计器...")
-    camera_movement_estimator = CameraMovementEstimator(video_frames[0])
-    
-    print_debug_info("计算每帧摄像头移动...")
-    camera_movement_per_frame = camera_movement_estimator.get_camera_movement(processed_frames,
-                                                                                read_from_stub=False,
-                                                                                stub_path='stubs/camera_movement_stub.pkl')
-    
     print_debug_info("调整跟踪数据中的位置信息...")
     camera_movement_estimator.add_adjust_positions_to_tracks(tracks,camera_movement_per_frame)
 
@@ -101,154 +303,106 @@ def main():
     view_transformer.add_transformed_position_to_tracks(tracks)
 
     print_debug_info("插值计算球的位置...")
-    tracks["ball"] = tracker.interpolate_ball_positions(tracks["ball"])
+    tracker.interpolate_ball_positions(tracks, args.ball_max_gap, args.ball_smoothing)
 
     print_debug_info("初始化速度和距离估计器...")
-    speed_and_distance_estimator = SpeedAndDistance_Estimator()
+    # 速度按处理帧之间的真实时间间隔计算
+    speed_and_distance_estimator = SpeedAndDistance_Estimator(frame_rate=video_fps / args.frame_interval)
     
     print_debug_info("计算球员速度和距离...")
     speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
 
-    print_debug_info("初始化队伍分配器...")
-    team_assigner = TeamAssigner()
-    
-    print_debug_info("分配队伍颜色...")
-    team_assigner.assign_team_color(video_frames[0], 
-                                    tracks['players'][0])
-    
-    print_debug_info("为每个球员分配队伍...")
-    total_frames = len(tracks['players'])
-    with tqdm(total=total_frames, desc="分配球员队伍", unit="帧") as pbar:
-        for frame_num, player_track in enumerate(tracks['players']):
-            # 使用处理过的帧进行队伍分配
-            for player_id, track in player_track.items():
-                team = team_assigner.get_player_team(processed_frames[frame_num],   
-                                                     track['bbox'],
-                                                     player_id)
-                tracks['players'][frame_num][player_id]['team'] = team 
-                tracks['players'][frame_num][player_id]['team_color'] = team_assigner.team_colors[team]
-            pbar.update(1)
-
-
     print_debug_info("初始化球员-球分配器...")
     player_assigner =PlayerBallAssigner()
-    team_ball_control= []
     
     print_debug_info("为每帧分配控球球员...")
-    total_frames = len(tracks['players'])
-    with tqdm(total=total_frames, desc="分配控球球员", unit="帧") as pbar:
-        for frame_num, player_track in enumerate(tracks['players']):
-            ball_bbox = tracks['ball'][frame_num][1]['bbox']
-            assigned_player = player_assigner.assign_ball_to_player(player_track, ball_bbox)
-
-            if assigned_player != -1:
-                tracks['players'][frame_num][assigned_player]['has_ball'] = True
-                team_ball_control.append(tracks['players'][frame_num][assigned_player]['team'])
-            else:
-                if team_ball_control:
-                    team_ball_control.append(team_ball_control[-1])
-                else:
-                    team_ball_control.append(1)  # 默认给team 1
-            pbar.update(1)
-    team_ball_control= np.array(team_ball_control)
+    # 所有帧的球员与球一次性向量化计算
+    player_rows = tracks.object_rows("players")
+    assigned = player_assigner.assign_ball_to_players(tracks['frame'][player_rows],
+                                                      tracks['bbox'][player_rows],
+                                                      tracks.ball_bboxes())
+    has_possession = assigned >= 0
+    assigned_rows = player_rows[assigned[has_possession]]
+    tracks['has_ball'][assigned_rows] = True
+    possession_teams = np.zeros(tracks.num_frames, dtype=int)
+    possession_teams[has_possession] = tracks['team'][assigned_rows]
+    team_ball_control = player_assigner.get_team_ball_control(possession_teams)
 
+    # 完整跟踪数据按列保存，下游工具（解说、越位分析、前端）可以只内存映射需要的列
+    analysis_dir = os.path.join(OUTPUT_DIR, "analysis")
+    os.makedirs(analysis_dir, exist_ok=True)
+    tracks_path = os.path.join(analysis_dir, "video_a1_1_tracks.npz")
+    tracks.save(tracks_path,
+                frame_indices=np.asarray(processed_frame_indices),
+                team_ball_control=np.asarray(team_ball_control))
+    print_debug_info(f"跟踪数据已保存: {tracks_path}")
 
-    ## Draw
-    print_debug_info("绘制标注信息到视频帧...")
-    # 如果使用了帧间隔，需要将处理后的帧信息扩展到所有原始帧
-    if args.frame_interval > 1:
-        print_debug_info(f"将处理结果从 {len(tracks['players'])} 帧扩展到 {len(video_frames)} 帧")
-        
-        # 创建扩展后的跟踪数据结构
-        extended_tracks = {
-            "players": [{} for _ in range(len(video_frames))],
-            "referees": [{} for _ in range(len(video_frames))],
-            "ball": [{} for _ in range(len(video_frames))]
-        }
-        
-        # 扩展后的队伍控球信息
-        extended_team_ball_control = np.zeros(len(video_frames), dtype=int)
-        
-        # 复制处理过的帧的数据到扩展后的数据结构
-        for i, frame_idx in enumerate(processed_frame_indices):
-            extended_tracks['players'][frame_idx] = tracks['players'][i]
-            extended_tracks['referees'][frame_idx] = tracks['referees'][i]
-            extended_tracks['ball'][frame_idx] = tracks['ball'][i]
-            extended_team_ball_control[frame_idx] = team_ball_control[i]
-        
-        # 对未处理的帧进行插值填充
-        print_debug_info("对未处理的帧进行插值填充...")
-        for i in range(1, len(video_frames) - 1):
-            if i not in processed_frame_indices:
-                # 找到前一个和后一个处理过的帧的索引
-                prev_processed = max([j for j in processed_frame_indices if j < i], default=0)
-                next_processed = min([j for j in processed_frame_indices if j > i], default=len(video_frames) - 1)
-                
-                # 简单复制前一处理帧的数据
-                extended_tracks['players'][i] = extended_tracks['players'][prev_processed].copy()
-                extended_tracks['referees'][i] = extended_tracks['referees'][prev_processed].copy()
-                extended_tracks['ball'][i] = extended_tracks['ball'][prev_processed].copy()
-                extended_team_ball_control[i] = extended_team_ball_control[prev_processed]
-        
-        # 使用扩展后的数据绘制标注
-        output_video_frames = tracker.draw_annotations(video_frames, extended_tracks, extended_team_ball_control)
-    else:
-        # 直接使用所有帧进行绘制
-        output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
 
-    print_debug_info("绘制摄像头移动轨迹...")
-    # 如果使用了帧间隔，需要扩展摄像头移动数据
-    if args.frame_interval > 1:
-        extended_camera_movement = [None] * len(video_frames)
-        for i, frame_idx in enumerate(processed_frame_indices):
-            extended_camera_movement[frame_idx] = camera_movement_per_frame[i]
-        # 对未处理的帧进行简单填充
-        for i in range(len(video_frames)):
-            if extended_camera_movement[i] is None:
-                # 找到前一个有数据的帧
-                j = i - 1
-                while j >= 0 and extended_camera_movement[j] is None:
-                    j -= 1
-                if j >= 0:
-                    extended_camera_movement[i] = extended_camera_movement[j]
-                else:
-                    extended_camera_movement[i] = (0, 0)  # 默认值
-        output_video_frames = camera_movement_estimator.draw_camera_movement(output_video_frames, extended_camera_movement)
-    else:
-        output_video_frames = camera_movement_estimator.draw_camera_movement(output_video_frames, camera_movement_per_frame)
 
-    print_debug_info("绘制球员速度和距离...")
+    ## Draw
+    print_debug_info("绘制标注信息到视频帧...")
+    # 如果使用了帧间隔，通过关键帧时间线把处理后的帧信息映射到所有原始帧，每帧查询 O(1)
     if args.frame_interval > 1:
-        speed_and_distance_estimator.draw_speed_and_distance(output_video_frames, extended_tracks)
-    else:
-        speed_and_distance_estimator.draw_speed_and_distance(output_video_frames, tracks)
+        print_debug_info(f"将处理结果从 {tracks.num_frames} 帧扩展到 {total_video_frames} 帧")
+    timeline = KeyframeTimeline(processed_frame_indices, total_video_frames)
+    interpolate_tracks = args.track_fill == 'interpolate'
+    draw_tracks = {object: timeline.track_view(object_tracks, interpolate_tracks)
+                   for object, object_tracks in tracks.as_tracks().items()}
+    draw_ball_control_percentages = tracker.get_team_ball_control_percentages(timeline.expand(team_ball_control))
+    draw_camera_movement = timeline.expand(camera_movement_per_frame)
 
     # 创建统一的视频输出目录
     video_output_dir = os.path.join(OUTPUT_DIR, "processed_videos")
     os.makedirs(video_output_dir, exist_ok=True)
-    
-    # 保存视频到统一目录
     output_filename = "video_a1_1.avi"
     output_path = os.path.join(video_output_dir, output_filename)
-    print_debug_info(f"保存处理后的视频到统一目录: {output_path}")
-    save_video(output_video_frames, output_path)
-    
+
     # 同时保存一份到原位置以保持兼容性
     legacy_output_dir = os.path.join(CURRENT_DIR, "output_videos")
     os.makedirs(legacy_output_dir, exist_ok=True)
     legacy_output_path = os.path.join(legacy_output_dir, output_filename)
-    save_video(output_video_frames, legacy_output_path)
+
+    # 第二遍：再次分块读取视频，绘制标注后直接写入编码器，不在内存中保留整段输出视频
+    print_debug_info(f"保存处理后的视频到统一目录: {output_path}")
+    frame_size = (video_reader.width, video_reader.height)
+    writers = [open_video_writer(output_path, frame_size, video_fps),
+               open_video_writer(legacy_output_path, frame_size, video_fps)]
+
+    # 各标注器注册逐帧回调，每帧只原地绘制一遍，随后直接写入编码器
+    renderer = FrameRenderer()
+    renderer.register(lambda frame, frame_num: tracker.draw_frame_annotations(
+        frame, frame_num, draw_tracks, draw_ball_control_percentages))
+    renderer.register(lambda frame, frame_num: camera_movement_estimator.draw_frame_camera_movement(
+        frame, frame_num, draw_camera_movement))
+    renderer.register(lambda frame, frame_num: speed_and_distance_estimator.draw_frame_speed_and_distance(
+        frame, frame_num, draw_tracks))
+
+    def draw_chunk(chunk):
+        chunk_start, chunk_frames = chunk
+        return renderer.render_chunk(chunk_frames, chunk_start)
+
+    # 解码、绘制、编码写入同样以流水线方式并发执行
+    try:
+        video_chunks = prefetch(read_video_chunks(args.input_video, args.chunk_size), args.pipeline_depth)
+        for output_frames in threaded_map(draw_chunk, video_chunks, args.pipeline_depth):
+            for writer in writers:
+                for frame in output_frames:
+                    writer.write(frame)
+    finally:
+        for writer in writers:
+            writer.release()
     
     # 生成比赛分析数据
     def generate_match_analysis():
         """生成比赛分析数据"""
         analysis = {
             "video_filename": output_filename,
-            "total_frames": len(video_frames),
-            "processed_frames": len(processed_frames),
+            "total_frames": total_video_frames,
+            "processed_frames": len(processed_frame_indices),
             "processing_time": elapsed_time,
             "team_ball_control": team_ball_control.tolist(),
-            "has_players": len(tracks["players"]) > 0 if args.frame_interval == 1 else len(extended_tracks["players"]) > 0
+            "has_players": len(draw_tracks["players"]) > 0,
+            "tracks_file": tracks_path
         }
         
         # 统计各队控球时间
@@ -274,8 +428,6 @@ def main():
     print_debug_info(f"比赛分析数据已保存: {analysis_path}")
     
     # 同时保存到统一的analysis目录
-    analysis_dir = os.path.join(OUTPUT_DIR, "analysis")
-    os.makedirs(analysis_dir, exist_ok=True)
     unified_analysis_path = os.path.join(analysis_dir, f"{os.path.splitext(output_filename)[0]}_analysis.json")
     with open(unified_analysis_path, 'w', encoding='utf-8') as f:
         json.dump(match_analysis, f, ensure_ascii=False, indent=2)
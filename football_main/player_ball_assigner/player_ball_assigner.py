@@ -1,27 +1,64 @@
 import sys 
 sys.path.append('../')
-from utils import get_center_of_bbox, measure_distance
+import numpy as np
 
 class PlayerBallAssigner():
     def __init__(self):
         self.max_player_ball_distance = 70
+
+    def get_ball_centers(self,ball_bboxes):
+        # 与 get_center_of_bbox 一致：取整后的 bbox 中心
+        ball_bboxes = np.asarray(ball_bboxes, dtype=np.float64).reshape(-1, 4)
+        return np.trunc(np.stack([(ball_bboxes[:, 0] + ball_bboxes[:, 2]) / 2,
+                                  (ball_bboxes[:, 1] + ball_bboxes[:, 3]) / 2], axis=1))
+
+    def get_foot_distances(self,player_bboxes,ball_positions):
+        # 左右脚（bbox 底边两端）到球的距离取较小值，所有球员一次计算
+        player_bboxes = np.asarray(player_bboxes, dtype=np.float64).reshape(-1, 4)
+        distance_left = np.hypot(player_bboxes[:, 0] - ball_positions[:, 0], player_bboxes[:, 3] - ball_positions[:, 1])
+        distance_right = np.hypot(player_bboxes[:, 2] - ball_positions[:, 0], player_bboxes[:, 3] - ball_positions[:, 1])
+        return np.minimum(distance_left, distance_right)
     
     def assign_ball_to_player(self,players,ball_bbox):
-        ball_position = get_center_of_bbox(ball_bbox)
+        if not players:
+            return -1
+        player_ids = list(players.keys())
+        player_bboxes = [player['bbox'] for player in players.values()]
+        distance = self.get_foot_distances(player_bboxes, self.get_ball_centers(ball_bbox))
+
+        # 距离相同时取先出现的球员，与逐个比较的结果一致
+        closest = int(np.argmin(distance))
+        if not distance[closest] < self.max_player_ball_distance:
+            return -1
+        return player_ids[closest]
 
-        miniumum_distance = 99999
-        assigned_player=-1
+    def assign_ball_to_players(self,player_frames,player_bboxes,ball_bboxes):
+        """整段视频一次分配控球球员
 
-        for player_id, player in players.items():
-            player_bbox = player['bbox']
+        player_frames: (M,) 每个球员检测所在帧；player_bboxes: (M,4)；
+        ball_bboxes: (num_frames,4)，没有球的帧为 NaN。
+        返回 (num_frames,) 数组，为每帧控球球员在 player_* 数组中的下标，无人控球为 -1。
+        """
+        player_frames = np.asarray(player_frames, dtype=np.int64)
+        num_frames = len(ball_bboxes)
+        assigned = np.full(num_frames, -1, dtype=np.int64)
 
-            distance_left = measure_distance((player_bbox[0],player_bbox[-1]),ball_position)
-            distance_right = measure_distance((player_bbox[2],player_bbox[-1]),ball_position)
-            distance = min(distance_left,distance_right)
+        ball_positions = self.get_ball_centers(ball_bboxes)
+        distance = self.get_foot_distances(player_bboxes, ball_positions[player_frames])
+        candidates = np.flatnonzero(distance < self.max_player_ball_distance)
+        if len(candidates) == 0:
+            return assigned
 
-            if distance < self.max_player_ball_distance:
-                if distance < miniumum_distance:
-                    miniumum_distance = distance
-                    assigned_player = player_id
+        # 按 (帧, 距离, 原顺序) 排序后，每帧第一个就是最近的球员
+        order = candidates[np.lexsort((candidates, distance[candidates], player_frames[candidates]))]
+        sorted_frames = player_frames[order]
+        first = np.r_[True, sorted_frames[1:] != sorted_frames[:-1]]
+        assigned[sorted_frames[first]] = order[first]
+        return assigned
 
-        return assigned_player
\ No newline at end of file
+    def get_team_ball_control(self,possession_teams):
+        """无人控球的帧沿用上一帧的控球队伍，开头无人控球时默认给 team 1"""
+        possession_teams = np.asarray(possession_teams)
+        has_possession = possession_teams > 0
+        last_possession = np.maximum.accumulate(np.where(has_possession, np.arange(len(possession_teams)), -1))
+        return np.where(last_possession >= 0, possession_teams[np.maximum(last_possession, 0)], 1)
@@ -1,73 +1,96 @@
 import cv2
+import numpy as np
 import sys 
 sys.path.append('../')
-from utils import measure_distance ,get_foot_position
+from utils import get_foot_position
 
 class SpeedAndDistance_Estimator():
-    def __init__(self):
+    def __init__(self, frame_rate=24):
         self.frame_window=5
-        self.frame_rate=24
+        self.frame_rate=frame_rate
     
     def add_speed_and_distance_to_tracks(self,tracks):
-        total_distance= {}
+        # 只统计球员：每 frame_window 帧为一个时间窗，窗口起止帧都出现的球员计算该窗口的速度
+        number_of_frames = tracks.num_frames
+        players = np.flatnonzero(tracks.object_mask("players"))
+        if len(players) == 0:
+            return
+        frames = tracks["frame"][players].astype(np.int64)
+        track_ids = tracks["track_id"][players].astype(np.int64)
+        positions = tracks["position_transformed"][players]
+        key_base = track_ids.max() + 1
 
-        for object, object_tracks in tracks.items():
-            if object == "ball" or object == "referees":
-                continue 
-            number_of_frames = len(object_tracks)
-            for frame_num in range(0,number_of_frames, self.frame_window):
-                last_frame = min(frame_num+self.frame_window,number_of_frames-1 )
+        window = frames // self.frame_window
+        start_frames = window * self.frame_window
+        last_frames = np.minimum(start_frames + self.frame_window, number_of_frames - 1)
 
-                for track_id,_ in object_tracks[frame_num].items():
-                    if track_id not in object_tracks[last_frame]:
-                        continue
+        # 在窗口结束帧中查找同一球员：(帧号, track_id) 组合成有序键后二分查找
+        frame_keys = frames * key_base + track_ids
+        frame_order = np.argsort(frame_keys)
+        sorted_frame_keys = frame_keys[frame_order]
 
-                    start_position = object_tracks[frame_num][track_id]['position_transformed']
-                    end_position = object_tracks[last_frame][track_id]['position_transformed']
+        start_idx = np.flatnonzero((frames == start_frames) & (last_frames > start_frames))
+        end_keys = last_frames[start_idx] * key_base + track_ids[start_idx]
+        found_at = np.minimum(np.searchsorted(sorted_frame_keys, end_keys), len(sorted_frame_keys) - 1)
+        end_idx = frame_order[found_at]
+        valid = ((sorted_frame_keys[found_at] == end_keys) &
+                 ~np.isnan(positions[start_idx, 0]) & ~np.isnan(positions[end_idx, 0]))
+        start_idx, end_idx = start_idx[valid], end_idx[valid]
+        if len(start_idx) == 0:
+            return
 
-                    if start_position is None or end_position is None:
-                        continue
-                    
-                    distance_covered = measure_distance(start_position,end_position)
-                    time_elapsed = (last_frame-frame_num)/self.frame_rate
-                    speed_meteres_per_second = distance_covered/time_elapsed
-                    speed_km_per_hour = speed_meteres_per_second*3.6
+        distance_covered = np.linalg.norm(positions[end_idx] - positions[start_idx], axis=1)
+        time_elapsed = (last_frames[start_idx] - start_frames[start_idx]) / self.frame_rate
+        speed_km_per_hour = distance_covered / time_elapsed * 3.6
 
-                    if object not in total_distance:
-                        total_distance[object]= {}
-                    
-                    if track_id not in total_distance[object]:
-                        total_distance[object][track_id] = 0
-                    
-                    total_distance[object][track_id] += distance_covered
+        # 按 (track_id, 窗口) 排序后分组累加，得到每个窗口结束时的累计跑动距离
+        window_ids = window[start_idx]
+        window_tracks = track_ids[start_idx]
+        order = np.lexsort((window_ids, window_tracks))
+        sorted_distance = distance_covered[order]
+        cumulative = np.cumsum(sorted_distance)
+        sorted_tracks = window_tracks[order]
+        group_start = np.r_[True, sorted_tracks[1:] != sorted_tracks[:-1]]
+        group_offset = (cumulative - sorted_distance)[group_start]
+        total_distance = np.empty_like(cumulative)
+        total_distance[order] = cumulative - group_offset[np.cumsum(group_start) - 1]
 
-                    for frame_num_batch in range(frame_num,last_frame):
-                        if track_id not in tracks[object][frame_num_batch]:
-                            continue
-                        tracks[object][frame_num_batch][track_id]['speed'] = speed_km_per_hour
-                        tracks[object][frame_num_batch][track_id]['distance'] = total_distance[object][track_id]
+        # 把窗口的速度和累计距离写回窗口内 [起始帧, 结束帧) 中出现的同一球员
+        window_keys = window_ids * key_base + window_tracks
+        window_order = np.argsort(window_keys)
+        sorted_window_keys = window_keys[window_order]
+        row_keys = window * key_base + track_ids
+        found_at = np.minimum(np.searchsorted(sorted_window_keys, row_keys), len(sorted_window_keys) - 1)
+        matched = (sorted_window_keys[found_at] == row_keys) & (frames < last_frames)
+        entry = window_order[found_at[matched]]
+        tracks["speed"][players[matched]] = speed_km_per_hour[entry]
+        tracks["distance"][players[matched]] = total_distance[entry]
     
-    def draw_speed_and_distance(self,frames,tracks):
-        output_frames = []
-        for frame_num, frame in enumerate(frames):
-            for object, object_tracks in tracks.items():
-                if object == "ball" or object == "referees":
-                    continue 
-                for _, track_info in object_tracks[frame_num].items():
-                   if "speed" in track_info:
-                       speed = track_info.get('speed',None)
-                       distance = track_info.get('distance',None)
-                       if speed is None or distance is None:
-                           continue
-                       
-                       bbox = track_info['bbox']
-                       position = get_foot_position(bbox)
-                       position = list(position)
-                       position[1]+=40
+    def draw_frame_speed_and_distance(self,frame,frame_num,tracks):
+        """在单帧上原地绘制球员速度和距离，可注册到 FrameRenderer"""
+        for object, object_tracks in tracks.items():
+            if object == "ball" or object == "referees":
+                continue 
+            for _, track_info in object_tracks[frame_num].items():
+               if "speed" in track_info:
+                   speed = track_info.get('speed',None)
+                   distance = track_info.get('distance',None)
+                   if speed is None or distance is None:
+                       continue
+                   
+                   bbox = track_info['bbox']
+                   position = get_foot_position(bbox)
+                   position = list(position)
+                   position[1]+=40
 
-                       position = tuple(map(int,position))
-                       cv2.putText(frame, f"{speed:.2f} km/h",position,cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
-                       cv2.putText(frame, f"{distance:.2f} m",(position[0],position[1]+20),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
-            output_frames.append(frame)
+                   position = tuple(map(int,position))
+                   cv2.putText(frame, f"{speed:.2f} km/h",position,cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
+                   cv2.putText(frame, f"{distance:.2f} m",(position[0],position[1]+20),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
+        return frame
+
+    def draw_speed_and_distance(self,frames,tracks,frame_offset=0):
+        output_frames = []
+        for frame_num, frame in enumerate(frames, start=frame_offset):
+            output_frames.append(self.draw_frame_speed_and_distance(frame, frame_num, tracks))
         
-        return output_frames
\ No newline at end of file
+        return output_frames
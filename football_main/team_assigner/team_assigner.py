@@ -1,7 +1,16 @@
+import cv2
+import numpy as np
 from sklearn.cluster import KMeans
 
 class TeamAssigner:
-    def __init__(self):
+    # color_method: "mask_mean" 为批量向量化的前景均值取色，"kmeans" 为原来的逐球员 KMeans 取色
+    COLOR_METHODS = ("mask_mean", "kmeans")
+
+    def __init__(self, color_method="mask_mean", crop_size=16):
+        if color_method not in self.COLOR_METHODS:
+            raise ValueError(f"Unknown color_method: {color_method}")
+        self.color_method = color_method
+        self.crop_size = crop_size
         self.team_colors = {}
         self.player_team_dict = {}
     
@@ -32,14 +41,45 @@ class TeamAssigner:
 
         return player_color
 
+    def get_player_colors(self,frame,bboxes):
+        """一次计算一帧中所有球员的球衣颜色，返回 (M,3)"""
+        if self.color_method == "kmeans":
+            return np.array([self.get_player_color(frame, bbox) for bbox in bboxes])
+        if len(bboxes) == 0:
+            return np.empty((0, 3))
+
+        # 每个球员取上半身，缩放到统一大小后堆叠，之后的计算对所有球员一次完成
+        size = self.crop_size
+        frame_height, frame_width = frame.shape[:2]
+        crops = np.empty((len(bboxes), size, size, 3), dtype=np.float32)
+        for i, bbox in enumerate(bboxes):
+            x1 = min(max(int(bbox[0]), 0), frame_width - 1)
+            y1 = min(max(int(bbox[1]), 0), frame_height - 1)
+            x2, y2 = min(int(bbox[2]), frame_width), min(int(bbox[3]), frame_height)
+            top_half_image = frame[y1:y1 + max((y2 - y1) // 2, 1), x1:max(x2, x1 + 1)]
+            crops[i] = cv2.resize(top_half_image, (size, size), interpolation=cv2.INTER_AREA)
+        pixels = crops.reshape(len(bboxes), -1, 3)
+
+        # 与 KMeans 版本相同的假设：四个角是背景（草地），用角点均色作背景色，
+        # 距背景最远的像素作前景初值，再做两轮向量化的二均值迭代
+        corners = crops[:, [0, 0, -1, -1], [0, -1, 0, -1]]
+        background = corners.mean(axis=1)
+        distance_to_background = np.linalg.norm(pixels - background[:, None], axis=2)
+        foreground = pixels[np.arange(len(bboxes)), distance_to_background.argmax(axis=1)]
+        for _ in range(2):
+            distance_to_foreground = np.linalg.norm(pixels - foreground[:, None], axis=2)
+            is_player = distance_to_foreground < distance_to_background
+            counts = is_player.sum(axis=1, keepdims=True)
+            foreground = np.where(counts > 0,
+                                  (pixels * is_player[..., None]).sum(axis=1) / np.maximum(counts, 1),
+                                  foreground)
+        return foreground
+
 
     def assign_team_color(self,frame, player_detections):
         
-        player_colors = []
-        for _, player_detection in player_detections.items():
-            bbox = player_detection["bbox"]
-            player_color =  self.get_player_color(frame,bbox)
-            player_colors.append(player_color)
+        bboxes = [player_detection["bbox"] for player_detection in player_detections.values()]
+        player_colors = self.get_player_colors(frame, bboxes)
         
         kmeans = KMeans(n_clusters=2, init="k-means++",n_init=10)
         kmeans.fit(player_colors)
@@ -51,17 +91,18 @@ class TeamAssigner:
 
 
     def get_player_team(self,frame,player_bbox,player_id):
-        if player_id in self.player_team_dict:
-            return self.player_team_dict[player_id]
-
-        player_color = self.get_player_color(frame,player_bbox)
-
-        team_id = self.kmeans.predict(player_color.reshape(1,-1))[0]
-        team_id+=1
-
-        if player_id ==91:
-            team_id=1
-
-        self.player_team_dict[player_id] = team_id
-
-        return team_id
+        return self.get_player_teams(frame, [player_bbox], [player_id])[0]
+
+    def get_player_teams(self,frame,player_bboxes,player_ids):
+        """批量分配一帧中所有球员的队伍，只为第一次出现的球员取色并一次性预测"""
+        new_players = [i for i, player_id in enumerate(player_ids) if player_id not in self.player_team_dict]
+        if new_players:
+            player_colors = self.get_player_colors(frame, [player_bboxes[i] for i in new_players])
+            team_ids = self.kmeans.predict(player_colors) + 1
+            for i, team_id in zip(new_players, team_ids):
+                player_id = player_ids[i]
+                if player_id ==91:
+                    team_id=1
+                self.player_team_dict[player_id] = int(team_id)
+
+        return [self.player_team_dict[player_id] for player_id in player_ids]
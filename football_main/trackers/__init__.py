@@ -1 +1,3 @@
-from .tracker import Tracker
\ No newline at end of file
+from .tracker import Tracker
+from .inference_backend import load_detector, export_model, BACKENDS, PRECISIONS
+from .batch_tuner import tune_inference_settings, IMGSZ_OPTIONS, BATCH_SIZES
@@ -0,0 +1,132 @@
+import numpy as np
+
+
+class BallKalman:
+    """球心的二维恒速卡尔曼滤波，状态 [x, y, vx, vy]，单位时间步为一个处理帧"""
+    def __init__(self, process_noise=50.0, measurement_noise=4.0):
+        self.transition = np.eye(4)
+        self.transition[0, 2] = self.transition[1, 3] = 1
+        # 离散白噪声加速度模型
+        noise_gain = np.array([[0.5, 0], [0, 0.5], [1, 0], [0, 1]])
+        self.process_covariance = process_noise * noise_gain @ noise_gain.T
+        self.measurement_noise = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.covariance = None
+
+    @property
+    def initialized(self):
+        return self.state is not None
+
+    def predict(self):
+        """推进一步，返回预测的球心；尚未初始化时返回 None"""
+        if self.state is None:
+            return None
+        self.state = self.transition @ self.state
+        self.covariance = self.transition @ self.covariance @ self.transition.T + self.process_covariance
+        return self.state[:2].copy()
+
+    def position_std(self):
+        return float(np.sqrt(max(self.covariance[0, 0], self.covariance[1, 1])))
+
+    def update(self, center):
+        center = np.asarray(center, dtype=np.float64)
+        if self.state is None:
+            # 第一个观测：位置取观测值，速度未知
+            self.state = np.array([center[0], center[1], 0.0, 0.0])
+            self.covariance = np.diag([self.measurement_noise, self.measurement_noise, 1e4, 1e4])
+            return
+        innovation_covariance = self.covariance[:2, :2] + self.measurement_noise * np.eye(2)
+        gain = self.covariance[:, :2] @ np.linalg.inv(innovation_covariance)
+        self.state = self.state + gain @ (center - self.state[:2])
+        self.covariance = self.covariance - gain @ self.covariance[:2, :]
+
+
+class BallRoiDetector:
+    """两级球检测：先在卡尔曼预测位置周围的原分辨率裁剪区域内找球，找不到再做整帧检测
+
+    整帧检测会把画面缩到模型输入尺寸，远处的球只剩几个像素；裁剪区域按原分辨率送入模型
+    （imgsz=crop_size），球更清晰，推理也只需处理 crop_size x crop_size 的输入。
+    预测位置的不确定度超过半个裁剪窗口时不做 ROI 搜索；连续超过 max_misses 帧没找到球时滤波器重置。
+    """
+    def __init__(self, model, ball_class_id, crop_size=320, conf=0.1, max_misses=3, full_frame_imgsz=640):
+        # ultralytics 会把每次 predict 的参数合并进预测器保留下来，这里每次调用都显式传入 imgsz 和 classes
+        self.model = model
+        self.ball_class_id = ball_class_id
+        self.crop_size = crop_size
+        self.full_frame_imgsz = full_frame_imgsz
+        self.conf = conf
+        self.max_misses = max_misses
+        self.kalman = BallKalman()
+        self.misses = 0
+        # 统计：ROI 搜索次数 / 命中次数，整帧搜索次数
+        self.roi_searches = 0
+        self.roi_hits = 0
+        self.full_frame_searches = 0
+
+    def predict(self):
+        """进入新的一帧：返回预测球心；没有可信的预测时返回 None"""
+        center = self.kalman.predict()
+        if center is None or self.kalman.position_std() > self.crop_size / 2:
+            return None
+        return center
+
+    def crop_window(self, frame_shape, center):
+        height, width = frame_shape[:2]
+        crop_width, crop_height = min(self.crop_size, width), min(self.crop_size, height)
+        x0 = int(np.clip(center[0] - crop_width / 2, 0, width - crop_width))
+        y0 = int(np.clip(center[1] - crop_height / 2, 0, height - crop_height))
+        return x0, y0, x0 + crop_width, y0 + crop_height
+
+    def best_ball(self, result, offset=(0, 0)):
+        """结果中置信度最高的球，返回 (xyxy, conf)；没有球时返回 None"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return None
+        classes = boxes.cls.cpu().numpy().astype(int)
+        confidences = boxes.conf.cpu().numpy()
+        candidates = np.flatnonzero((classes == self.ball_class_id) & (confidences >= self.conf))
+        if len(candidates) == 0:
+            return None
+        best = candidates[np.argmax(confidences[candidates])]
+        bbox = boxes.xyxy[best].cpu().numpy().astype(np.float64)
+        bbox[[0, 2]] += offset[0]
+        bbox[[1, 3]] += offset[1]
+        return bbox, float(confidences[best])
+
+    def search_roi(self, frame, center):
+        self.roi_searches += 1
+        x0, y0, x1, y1 = self.crop_window(frame.shape, center)
+        result = self.model.predict(frame[y0:y1, x0:x1], imgsz=self.crop_size, conf=self.conf,
+                                    classes=[self.ball_class_id], verbose=False)[0]
+        ball = self.best_ball(result, (x0, y0))
+        if ball is not None:
+            self.roi_hits += 1
+        return ball
+
+    def search_full_frame(self, frame):
+        self.full_frame_searches += 1
+        return self.best_ball(self.model.predict(frame, imgsz=self.full_frame_imgsz, conf=self.conf,
+                                                 classes=[self.ball_class_id], verbose=False)[0])
+
+    def observe(self, ball):
+        """用这一帧最终采用的球框（或 None）更新滤波器"""
+        if ball is None:
+            self.misses += 1
+            if self.misses > self.max_misses:
+                self.kalman.reset()
+            return
+        self.misses = 0
+        bbox = ball[0]
+        self.kalman.update(((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2))
+
+    def detect(self, frame):
+        """单独检测球时使用：ROI 优先，失败再整帧，返回 (xyxy, conf) 或 None"""
+        center = self.predict()
+        ball = self.search_roi(frame, center) if center is not None else None
+        if ball is None:
+            ball = self.search_full_frame(frame)
+        self.observe(ball)
+        return ball
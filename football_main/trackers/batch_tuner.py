@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import socket
+import datetime
+import psutil
+import sys
+sys.path.append('../')
+from utils import file_hash, match_rate
+
+
+def print_debug_info(message):
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[DEBUG {timestamp}] {message}")
+
+
+# 候选批大小，从小到大探测
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+# 候选推理尺寸，从大到小；第一个为基准（模型训练尺寸），更小的尺寸只有检测结果与基准足够一致时才会被选用
+IMGSZ_OPTIONS = (640, 512, 416, 320)
+# 批推理时每帧内存约为 float32 输入张量的多少倍（包含中间特征图），用来按可用内存限制批大小
+ACTIVATION_MEMORY_FACTOR = 32
+# 批推理最多占用的可用内存比例
+MEMORY_FRACTION = 0.5
+
+
+def frame_memory(frame, imgsz):
+    """一帧参与批推理时的内存估计：原始帧 + 输入张量及中间特征图"""
+    return frame.nbytes + 3 * imgsz * imgsz * 4 * ACTIVATION_MEMORY_FACTOR
+
+
+def max_batch_for_memory(frame, imgsz, available=None, fraction=MEMORY_FRACTION):
+    """按当前可用内存允许的最大批大小，至少为 1"""
+    if available is None:
+        available = psutil.virtual_memory().available
+    return max(1, int(available * fraction // frame_memory(frame, imgsz)))
+
+
+def predict_kwargs(imgsz, conf, verbose=False):
+    # imgsz 为 None 时沿用模型自身的推理尺寸
+    kwargs = {"conf": conf, "verbose": verbose}
+    if imgsz is not None:
+        kwargs["imgsz"] = imgsz
+    return kwargs
+
+
+def measure_fps(model, frames, batch_size, imgsz, conf=0.1, repeats=2):
+    """用样本帧（不足时循环重复）凑成一个批次，返回稳定后的每秒帧数"""
+    batch = [frames[i % len(frames)] for i in range(batch_size)]
+    kwargs = predict_kwargs(imgsz, conf)
+    # 预热：首次出现的输入形状在部分推理引擎上会触发重新编译
+    model.predict(batch, **kwargs)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(batch, **kwargs)
+    return batch_size * repeats / (time.perf_counter() - start)
+
+
+def detect_boxes(model, frames, imgsz, conf=0.1):
+    return [(result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(int))
+            for frame in frames for result in model.predict([frame], **predict_kwargs(imgsz, conf))]
+
+
+def tune_inference_settings(model, frames, imgsz_options=IMGSZ_OPTIONS, batch_sizes=BATCH_SIZES, conf=0.1,
+                            min_agreement=0.9, min_gain=1.05):
+    """探测每秒帧数最高的 (batch_size, imgsz)，返回 {"batch_size", "imgsz", "fps"}
+
+    每个推理尺寸下批大小从小到大尝试，超出内存估计、推理出错或吞吐量提升不足 min_gain 时停止增大。
+    imgsz_options 中第一个尺寸为基准，其余尺寸的检测框与基准的匹配率低于 min_agreement 时跳过。
+    """
+    reference = None
+    best = None
+    for imgsz in imgsz_options:
+        detections = detect_boxes(model, frames, imgsz, conf)
+        if reference is None:
+            reference = detections
+        else:
+            agreement = match_rate(reference, detections)
+            if agreement < min_agreement:
+                print_debug_info(f"推理尺寸 {imgsz} 与基准检测匹配率 {agreement * 100:.1f}%，低于要求，跳过")
+                continue
+
+        memory_limit = max_batch_for_memory(frames[0], imgsz or 640)
+        previous_fps = 0.0
+        for batch_size in batch_sizes:
+            if batch_size > memory_limit and batch_size > 1:
+                print_debug_info(f"批大小 {batch_size} 超出可用内存估计（上限 {memory_limit}），停止增大")
+                break
+            try:
+                fps = measure_fps(model, frames, batch_size, imgsz, conf)
+            except Exception as e:
+                print_debug_info(f"批大小 {batch_size} 推理失败，停止增大: {str(e)}")
+                break
+            print_debug_info(f"推理尺寸 {imgsz}, 批大小 {batch_size}: {fps:.2f} FPS")
+            if best is None or fps > best["fps"]:
+                best = {"batch_size": batch_size, "imgsz": imgsz, "fps": fps}
+            if fps < previous_fps * min_gain:
+                break
+            previous_fps = fps
+    return best
+
+
+def tuning_key(model_path, backend, precision, frame_shape, imgsz_options):
+    """调优结果按主机、模型权重、推理后端、画面尺寸和候选尺寸区分"""
+    height, width = frame_shape[:2]
+    candidates = ",".join(str(imgsz) for imgsz in imgsz_options)
+    return (f"{socket.gethostname()}|{file_hash(model_path)[:16]}|{backend}|{precision}|"
+            f"{width}x{height}|{candidates}")
+
+
+def load_tuning(path, key):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+
+
+def save_tuning(path, key, settings):
+    """读-改-写调优文件，先写临时文件再原子替换"""
+    entries = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+    entries[key] = settings
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,143 @@
+from ultralytics import YOLO
+import os
+import numpy as np
+import datetime
+import sys
+from functools import partial
+sys.path.append('../')
+from utils import export_int8_openvino
+
+
+def print_debug_info(message):
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[DEBUG {timestamp}] {message}")
+
+
+# torch: 直接用 PyTorch 加载 .pt；onnx / openvino: 导出一次后缓存在 .pt 旁边，用对应的 CPU 推理引擎执行
+BACKENDS = ("torch", "onnx", "openvino")
+# fp32: 原始精度；int8: 训练后量化（NNCF 校准），由 OpenVINO 执行
+PRECISIONS = ("fp32", "int8")
+# 默认的 INT8 校准数据：input_videos 中的视频帧
+DEFAULT_CALIBRATION_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'input_videos')
+
+
+def exported_model_path(model_path, backend, precision="fp32"):
+    """导出产物的路径，与 ultralytics 导出时的默认命名一致：best.onnx / best_openvino_model/ / best_int8_openvino_model/"""
+    stem = os.path.splitext(model_path)[0]
+    if backend == "onnx" and precision == "fp32":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if precision == "int8" else f"{stem}_openvino_model"
+    raise ValueError(f"后端 {backend} 不支持导出 {precision} 模型")
+
+
+def export_model(model_path, backend, imgsz=640, precision="fp32", calibration_source=DEFAULT_CALIBRATION_SOURCE):
+    """把 .pt 导出为 backend 格式并返回导出路径；已有且不旧于 .pt 的导出产物直接复用
+
+    precision="int8" 时用 calibration_source（视频/图片目录或 data.yaml）校准，导出 INT8 OpenVINO 模型；
+    校准来源变化时重新导出。
+    """
+    export_path = exported_model_path(model_path, backend, precision)
+    if precision == "int8":
+        print_debug_info(f"准备 {backend} {precision} 模型（校准数据: {calibration_source}）: {export_path}")
+        # dynamic=True 使导出的模型支持任意批大小，detect_frames 按批推理
+        return export_int8_openvino(model_path, calibration_source, imgsz, dynamic=True)
+    if os.path.exists(export_path) and os.path.getmtime(export_path) >= os.path.getmtime(model_path):
+        print_debug_info(f"使用已缓存的 {backend} {precision} 模型: {export_path}")
+        return export_path
+
+    print_debug_info(f"导出 {backend} {precision} 模型: {model_path} -> {export_path}")
+    model = YOLO(model_path)
+    # dynamic=True 使导出的模型支持任意批大小，detect_frames 按批推理
+    exported = model.export(format=backend, imgsz=imgsz, dynamic=True)
+    return str(exported)
+
+
+def set_num_threads(model, backend, num_threads, export_path=None):
+    """设置推理引擎的 intra-op 线程数
+
+    ultralytics 在第一次 predict 时才创建推理会话，因此先用一张空白图预热，
+    再用导出产物按指定线程数重建 ONNX Runtime 会话 / 重新编译 OpenVINO 模型。
+    8.4 起 AutoBackend 把推理委托给 autobackend.backend，会话要替换在那里；8.3 直接在 AutoBackend 上。
+    替换后读回实际生效的线程数，未生效时打印警告。
+    """
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(num_threads)
+        return
+
+    model.predict(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+    autobackend = getattr(getattr(model, "predictor", None), "model", None)
+    target = getattr(autobackend, "backend", autobackend)
+    applied = None
+    if backend == "onnx" and hasattr(target, "session"):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        target.session = onnxruntime.InferenceSession(export_path, options, providers=["CPUExecutionProvider"])
+        applied = target.session.get_session_options().intra_op_num_threads
+    elif backend == "openvino" and hasattr(target, "ov_compiled_model"):
+        import openvino as ov
+        core = ov.Core()
+        xml_path = next(f for f in sorted(os.listdir(export_path)) if f.endswith(".xml"))
+        ov_model = core.read_model(os.path.join(export_path, xml_path))
+        if ov_model.get_parameters()[0].get_layout().empty:
+            ov_model.get_parameters()[0].set_layout(ov.Layout("NCHW"))
+        # ultralytics 对 OpenVINO 模型同步推理，使用 LATENCY 模式；compile_model 也一并替换，
+        # 使 8.4 中按输入形状重新编译（AMX INT8 动态形状）时保持同样的线程数
+        config = {"INFERENCE_NUM_THREADS": num_threads, "PERFORMANCE_HINT": "LATENCY"}
+        if hasattr(target, "compile_model"):
+            target.compile_model = partial(core.compile_model, device_name="CPU", config=config)
+        target.ov_compiled_model = core.compile_model(ov_model, device_name="CPU", config=config)
+        applied = int(target.ov_compiled_model.get_property("INFERENCE_NUM_THREADS"))
+
+    if applied is None:
+        print_debug_info(f"当前 ultralytics 版本无法设置 {backend} 线程数，使用默认设置")
+    elif applied != num_threads:
+        print_debug_info(f"警告: {backend} 线程数设置未生效（请求 {num_threads}，实际 {applied}）")
+    else:
+        print_debug_info(f"{backend} 推理线程数: {applied}")
+
+
+# 常驻进程（analysis_worker.py）中按加载参数缓存的检测模型，后续任务直接复用
+_resident_models = {}
+
+
+def load_detector(model_path, device='cpu', backend='torch', num_threads=None, imgsz=640, precision="fp32",
+                  calibration_source=DEFAULT_CALIBRATION_SOURCE, task="detect", resident=False, slot="detector"):
+    """按后端和精度加载检测模型，返回可直接 predict 的 ultralytics YOLO 对象
+
+    导出的模型不带任务信息，task 需与 .pt 一致（分割模型传 "segment"）。
+    resident=True 时同一进程内相同参数（含权重修改时间）只加载一次；slot 区分需要各自独立
+    预测器的模型实例（例如球 ROI 搜索）。
+    """
+    if resident:
+        key = (os.path.abspath(model_path), os.path.getmtime(model_path), device, backend, num_threads, imgsz,
+               precision, calibration_source if precision == "int8" else None, task, slot)
+        if key not in _resident_models:
+            _resident_models[key] = load_detector(model_path, device, backend, num_threads, imgsz, precision,
+                                                  calibration_source, task)
+        else:
+            print_debug_info(f"复用常驻检测模型: {model_path} ({backend} {precision}, {slot})")
+        return _resident_models[key]
+
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {backend}，可选 {BACKENDS}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"未知的推理精度: {precision}，可选 {PRECISIONS}")
+    if precision == "int8" and backend != "openvino":
+        raise ValueError("INT8 量化模型需要使用 openvino 后端")
+
+    export_path = None
+    if backend == "torch":
+        model = YOLO(model_path)
+        model.to(device)  # 使用to方法设置设备
+    else:
+        export_path = export_model(model_path, backend, imgsz, precision, calibration_source)
+        model = YOLO(export_path, task=task)
+
+    if num_threads:
+        set_num_threads(model, backend, num_threads, export_path)
+    return model
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """帧差运动门控：画面相对上一次检测帧几乎没有变化时跳过 YOLO 检测
+
+    把帧缩小成低分辨率灰度图，与上一次真正检测的帧比较平均绝对差（0-255）。
+    低于 threshold 的帧跳过检测，连续跳过 max_skip 帧后强制检测一次，防止误差累积。
+    threshold <= 0 时关闭门控，所有帧都检测。状态跨调用保留，可逐块使用。
+    """
+    def __init__(self, threshold=0.0, max_skip=4, size=(64, 36)):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.size = size
+        self.reference = None
+        self.skip_run = 0
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    @property
+    def skipped_fraction(self):
+        return self.frames_skipped / self.frames_seen if self.frames_seen else 0.0
+
+    def thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def should_detect(self, frame):
+        self.frames_seen += 1
+        if not self.enabled:
+            return True
+        thumbnail = self.thumbnail(frame)
+        if (self.reference is None or self.skip_run >= self.max_skip
+                or np.mean(np.abs(thumbnail - self.reference)) >= self.threshold):
+            self.reference = thumbnail
+            self.skip_run = 0
+            return True
+        self.skip_run += 1
+        self.frames_skipped += 1
+        return False
@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+# 草地颜色范围（OpenCV HSV，H 为 0-180）
+GRASS_HSV_LOWER = (30, 30, 30)
+GRASS_HSV_UPPER = (90, 255, 255)
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """覆盖整帧的 tile 坐标 (x0, y0, x1, y1) 列表，相邻 tile 重叠 overlap 比例，最后一行/列贴齐画面边缘"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        return positions + [length - tile_size]
+
+    return [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+            for y0 in starts(height) for x0 in starts(width)]
+
+
+def non_grass_integral(frame):
+    """非草地像素的积分图；先做一次开运算去掉压缩噪声造成的孤立点"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    non_grass = cv2.bitwise_not(cv2.inRange(hsv, GRASS_HSV_LOWER, GRASS_HSV_UPPER))
+    non_grass = cv2.morphologyEx(non_grass, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    return cv2.integral((non_grass > 0).astype(np.uint8))
+
+
+def region_count(integral, x0, y0, x1, y1):
+    return int(integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0])
+
+
+def merge_detections(boxes, scores, classes, threshold=0.5):
+    """按类别做贪心 NMS，重叠度用交集 / 较小框面积（IOS）
+
+    tile 边缘截断的框是完整框的一部分，IoU 很小但 IOS 接近 1，能被正确抑制。返回保留的下标。
+    """
+    order = np.argsort(-scores, kind="stable")
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for position, index in enumerate(order):
+        if suppressed[index]:
+            continue
+        keep.append(index)
+        rest = order[position + 1:]
+        rest = rest[~suppressed[rest] & (classes[rest] == classes[index])]
+        if len(rest) == 0:
+            continue
+        top_left = np.maximum(boxes[rest, :2], boxes[index, :2])
+        bottom_right = np.minimum(boxes[rest, 2:], boxes[index, 2:])
+        intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+        overlap = intersection / (np.minimum(areas[rest], areas[index]) + 1e-9)
+        suppressed[rest[overlap > threshold]] = True
+    return np.asarray(keep, dtype=int)
+
+
+class TiledDetector:
+    """SAHI 式分块推理：整帧 + 重叠 tile 一起送入一次 predict，结果平移回整帧坐标后用 NMS 合并
+
+    4K 广角画面缩到模型输入尺寸后球员和球只有几个像素；tile 按原分辨率送入模型，小目标更清晰。
+    整帧检测保留对跨 tile 大目标的完整检测。只有草地的 tile（非草地像素少于 min_object_pixels）跳过。
+    """
+    def __init__(self, model, tile_size=640, overlap=0.2, conf=0.1, merge_threshold=0.5, min_object_pixels=16):
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.conf = conf
+        self.merge_threshold = merge_threshold
+        self.min_object_pixels = min_object_pixels
+        self.tiles_total = 0
+        self.tiles_skipped = 0
+
+    @property
+    def skipped_fraction(self):
+        return self.tiles_skipped / self.tiles_total if self.tiles_total else 0.0
+
+    def select_tiles(self, frame):
+        height, width = frame.shape[:2]
+        tiles = tile_grid(width, height, self.tile_size, self.overlap)
+        # 整帧本身就不大于一个 tile 时分块没有意义
+        if len(tiles) <= 1:
+            return []
+        integral = non_grass_integral(frame)
+        selected = [tile for tile in tiles if region_count(integral, *tile) >= self.min_object_pixels]
+        self.tiles_total += len(tiles)
+        self.tiles_skipped += len(tiles) - len(selected)
+        return selected
+
+    def detect(self, frame, imgsz=None):
+        """返回整帧坐标下合并后的 ultralytics Results"""
+        return self.detect_batch([frame], imgsz)[0]
+
+    def detect_batch(self, frames, imgsz=None, batch_size=None):
+        """多帧的整帧和 tile 拼成图像序列，每 batch_size 张图送入一次 predict，按帧合并结果
+
+        imgsz 由调用方每次传入（None 时为 tile_size），避免与其他调用共用预测器时参数残留。
+        """
+        imgsz = imgsz or self.tile_size
+        images, owners = [], []
+        for index, frame in enumerate(frames):
+            tiles = self.select_tiles(frame)
+            images.append(frame)
+            owners.append((index, 0, 0))
+            for x0, y0, x1, y1 in tiles:
+                images.append(frame[y0:y1, x0:x1])
+                owners.append((index, x0, y0))
+        step = batch_size or len(images)
+        results = []
+        for start in range(0, len(images), step):
+            results.extend(self.model.predict(images[start:start + step], imgsz=imgsz, conf=self.conf, verbose=False))
+
+        data = [[] for _ in frames]
+        for result, (index, x0, y0) in zip(results, owners):
+            rows = result.boxes.data[:, :6].cpu().numpy().astype(np.float64)
+            rows[:, [0, 2]] += x0
+            rows[:, [1, 3]] += y0
+            data[index].append(rows)
+        merged = []
+        for frame, rows in zip(frames, data):
+            tiled = len(rows) > 1
+            rows = np.concatenate(rows)
+            if tiled:
+                rows = rows[merge_detections(rows[:, :4], rows[:, 4], rows[:, 5].astype(int), self.merge_threshold)]
+            merged.append(Results(frame, path=results[0].path, names=results[0].names,
+                                  boxes=torch.as_tensor(rows, dtype=torch.float32)))
+        return merged
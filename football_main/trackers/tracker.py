@@ -1,14 +1,20 @@
-from ultralytics import YOLO
 import supervision as sv
 import pickle
 import os
 import numpy as np
-import pandas as pd
 import cv2
+import torch
+import functools
+import zipfile
 import sys 
 sys.path.append('../')
-from utils import get_center_of_bbox, get_bbox_width, get_foot_position
+from utils import get_center_of_bbox, get_bbox_width, npz_path, threaded_map, prefetch, TrackTable, blend_rectangle, interpolate_gaps, smooth_constant_velocity
 from tqdm import tqdm
+from .inference_backend import load_detector
+from .motion_gate import MotionGate
+from .ball_roi import BallRoiDetector
+from .tiled_inference import TiledDetector
+from .batch_tuner import tune_inference_settings, tuning_key, load_tuning, save_tuning, predict_kwargs, IMGSZ_OPTIONS
 import datetime
 
 # 添加调试打印函数
@@ -16,84 +22,301 @@ def print_debug_info(message):
     timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print(f"[DEBUG {timestamp}] {message}")
 
+# 徽章精灵四周留出的透明边距，容纳超出矩形的文字笔画
+BADGE_PADDING = 4
+
+
+def draw_id_badge(canvas, x1_rect, y1_rect, rectangle_width, rectangle_height, text, rect_color, text_color):
+    """画 track ID 徽章：实心矩形 + 自适应大小、居中的数字"""
+    x2_rect = x1_rect + (rectangle_width // 2) * 2
+    y2_rect = y1_rect + (rectangle_height // 2) * 2
+    cv2.rectangle(
+        canvas,
+        (int(x1_rect), int(y1_rect)),
+        (int(x2_rect), int(y2_rect)),
+        rect_color,
+        cv2.FILLED
+    )
+
+    # 动态计算字体大小和位置
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    initial_scale = 1.0  # 初始字体缩放比例
+    thickness = 2  # 初始线条粗细
+
+    # 计算允许的最大文本尺寸（考虑边距）
+    margin_x, margin_y = 5, 5
+    max_text_width = rectangle_width - 2 * margin_x
+    max_text_height = rectangle_height - 2 * margin_y
+
+    # 获取初始文本尺寸
+    (text_width, text_height), baseline = cv2.getTextSize(text, font, initial_scale, thickness)
+    text_total_height = text_height + baseline  # 包含基线高度的总高度
+
+    # 动态调整缩放比例
+    if text_width > max_text_width or text_total_height > max_text_height:
+        width_ratio = max_text_width / text_width
+        height_ratio = max_text_height / text_total_height
+        scale = initial_scale * min(width_ratio, height_ratio)
+    else:
+        scale = initial_scale
+    # 矩形太小放不下数字时只画矩形（负的缩放比例会把文字镜像画到画面其他位置）
+    if scale <= 0:
+        return
+
+    # 重新计算调整后的文本尺寸
+    (text_width, text_height), baseline = cv2.getTextSize(text, font, scale, thickness)
+    text_total_height = text_height + baseline
+
+    # 计算文本位置（居中）
+    x_center_rect = x1_rect + rectangle_width // 2
+    y_center_rect = y1_rect + rectangle_height // 2
+    x_text = x_center_rect - text_width // 2
+    y_text = y_center_rect + (text_height - baseline) // 2  # 垂直居中调整
+
+    # 根据缩放比例调整线条粗细
+    adjusted_thickness = max(1, int(thickness * scale))
+
+    cv2.putText(
+        canvas,
+        text,
+        (int(x_text), int(y_text)),
+        font,
+        scale,
+        text_color,
+        adjusted_thickness
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def render_id_badge(track_id, rectangle_width, rectangle_height, color):
+    """预渲染 ID 徽章精灵，按 (track_id, 矩形尺寸, 颜色) 做 LRU 缓存；返回 (BGR 图, 不透明掩码)"""
+    height = (rectangle_height // 2) * 2 + 1 + 2 * BADGE_PADDING
+    width = (rectangle_width // 2) * 2 + 1 + 2 * BADGE_PADDING
+    sprite = np.zeros((height, width, 3), dtype=np.uint8)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    draw_id_badge(sprite, BADGE_PADDING, BADGE_PADDING, rectangle_width, rectangle_height,
+                  str(track_id), color, (0, 0, 0))
+    draw_id_badge(mask, BADGE_PADDING, BADGE_PADDING, rectangle_width, rectangle_height,
+                  str(track_id), 255, 255)
+    return sprite, mask
+
+
+def blit_sprite(frame, sprite, mask, x, y):
+    """把精灵的不透明像素贴到 frame 的 (x, y) 处，超出画面的部分裁掉"""
+    frame_height, frame_width = frame.shape[:2]
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + sprite.shape[1], frame_width), min(y + sprite.shape[0], frame_height)
+    if x1 >= x2 or y1 >= y2:
+        return
+    sprite_rows = slice(y1 - y, y2 - y)
+    sprite_cols = slice(x1 - x, x2 - x)
+    cv2.copyTo(sprite[sprite_rows, sprite_cols], mask[sprite_rows, sprite_cols], frame[y1:y2, x1:x2])
+
+
 class Tracker:
-    def __init__(self, model_path, device='cpu'):
-        self.model = YOLO(model_path)
-        self.model.to(device)  # 使用to方法设置设备
+    # ID 徽章精灵缓存开关，以及缓存键中 bbox 宽度的量化步长（像素）
+    # ID 徽章精灵缓存：与直接绘制逐像素一致，但标注基准中整帧提速不明显，默认关闭
+    cache_badges = False
+    # 跟踪结果的版本号，参与阶段缓存键；检测/跟踪算法常量（置信度阈值、ByteTrack 参数、门控外推等）
+    # 修改后递增，使旧的跟踪缓存失效
+    RESULT_VERSION = 2
+
+    def __init__(self, model_path, device='cpu', backend='torch', num_threads=None, precision='fp32',
+                 batch_size=20, imgsz=None, motion_threshold=0.0, motion_max_skip=4, ball_roi=False,
+                 ball_crop_size=320, tiled=False, tile_size=640, tile_overlap=0.2, resident=False):
+        # backend 为 onnx / openvino 时首次使用会导出模型并缓存在 .pt 旁边；
+        # precision='int8' 时用 input_videos 中的视频帧校准，导出 INT8 OpenVINO 模型；
+        # resident=True 时复用本进程中已加载的模型（常驻 worker），ByteTrack 等跟踪状态仍属于本实例；
+        # model_path 为 None 时不加载检测模型，只用于插值、统计和绘制（跟踪结果来自缓存）
+        self.model = None if model_path is None else load_detector(model_path, device, backend, num_threads,
+                                                                    precision=precision, resident=resident)
         self.tracker = sv.ByteTrack()
+        self.model_path = model_path
+        self.backend = backend
+        self.precision = precision
+        # 检测批大小和推理尺寸（None 为模型默认尺寸），可由 autotune 按本机性能选择
+        self.batch_size = batch_size
+        self.imgsz = imgsz
+        # ultralytics 会把 predict 参数保留在预测器上，常驻模型被多个任务复用时每次都显式传入推理尺寸
+        self.default_imgsz = self.model.overrides.get('imgsz', 640) if self.model is not None else 640
+        # 运动门控：画面几乎不变的帧跳过检测，由最近两次检测的恒速外推补上（threshold 为 0 时关闭）
+        self.motion_gate = MotionGate(motion_threshold, motion_max_skip)
+        # 最近两次真正检测帧的跟踪结果 [(帧号, {(目标类型, track_id): bbox})]，用于外推跳过的帧
+        self.recent_outputs = []
+        # 分块推理：整帧 + 非草地的重叠 tile 一起检测，结果用 NMS 合并。
+        # tile 按原分辨率送入模型，推理尺寸默认取 tile 边长；batch_size 为每次 predict 的图像数
+        self.tiled_detector = None
+        if tiled and self.model is not None:
+            self.tiled_detector = TiledDetector(self.model, tile_size, tile_overlap, conf=0.1)
+            self.imgsz = imgsz or tile_size
+        # 球 ROI 搜索：整帧检测漏掉球时，在卡尔曼预测位置附近按原分辨率裁剪再检测一次。
+        # 使用单独加载的模型，避免裁剪推理的 imgsz / classes 参数残留到整帧检测的预测器中
+        self.ball_detector = None
+        if ball_roi and self.model is not None:
+            roi_model = load_detector(model_path, device, backend, num_threads, precision=precision,
+                                      resident=resident, slot="ball_roi")
+            self.ball_detector = BallRoiDetector(roi_model, None, ball_crop_size)
+
+    def autotune(self, frames, tuning_path, imgsz_options=IMGSZ_OPTIONS, retune=False):
+        """按本机可用内存和批推理延迟选择 batch_size / imgsz，结果按主机持久化到 tuning_path
+
+        同一主机、模型、后端和画面尺寸再次运行时直接读取已保存的结果，retune=True 时重新探测。
+        分块推理模式下只探测批大小：缩小推理尺寸会让 tile 失去原分辨率的意义，imgsz 固定为当前值。
+        """
+        if self.tiled_detector is not None:
+            imgsz_options = (self.imgsz,)
+            print_debug_info(f"分块推理模式，推理尺寸固定为 {self.imgsz}，只探测批大小")
+        key = tuning_key(self.model_path, self.backend, self.precision, frames[0].shape, imgsz_options)
+        settings = None if retune else load_tuning(tuning_path, key)
+        if settings is None:
+            print_debug_info(f"开始探测检测批大小和推理尺寸，样本 {len(frames)} 帧")
+            settings = tune_inference_settings(self.model, frames, imgsz_options)
+            if settings is None:
+                print_debug_info("探测失败，保持原有设置")
+                return None
+            save_tuning(tuning_path, key, settings)
+        self.batch_size = settings["batch_size"]
+        self.imgsz = settings["imgsz"]
+        print_debug_info(f"检测批大小 {self.batch_size}, 推理尺寸 {self.imgsz}（探测吞吐量 {settings['fps']:.2f} FPS）")
+        return settings
+
+    def predict_batch(self, frames):
+        """批量检测；出错（如内存不足）时把批次对半拆开重试，单帧仍失败才抛出异常
+
+        拆小后成功的批大小会沿用到后续批次。分块推理模式下这批帧的整帧和 tile 按 batch_size 张一组 predict。
+        """
+        try:
+            if self.tiled_detector is not None:
+                return self.tiled_detector.detect_batch(frames, self.imgsz, self.batch_size)
+            return self.model.predict(frames, **predict_kwargs(self.imgsz or self.default_imgsz, 0.1, verbose=True))
+        except Exception as e:
+            if len(frames) <= 1:
+                raise
+            half = (len(frames) + 1) // 2
+            print_debug_info(f"批大小 {len(frames)} 检测出错，拆成 {half} 重试: {str(e)}")
+            self.batch_size = min(self.batch_size, half)
+            return self.predict_batch(frames[:half]) + self.predict_batch(frames[half:])
 
     def add_position_to_tracks(self,tracks):
-        for object, object_tracks in tracks.items():
-            for frame_num, track in enumerate(object_tracks):
-                for track_id, track_info in track.items():
-                    bbox = track_info['bbox']
-                    if object == 'ball':
-                        position= get_center_of_bbox(bbox)
-                    else:
-                        position = get_foot_position(bbox)
-                    tracks[object][frame_num][track_id]['position'] = position
-
-    def interpolate_ball_positions(self,ball_positions):
-        ball_positions = [x.get(1,{}).get('bbox',[]) for x in ball_positions]
-        df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
-
-        # Interpolate missing values
-        df_ball_positions = df_ball_positions.interpolate()
-        df_ball_positions = df_ball_positions.bfill()
+        # 球取 bbox 中心，其余目标取脚底位置，整表一次向量化计算
+        bbox = tracks["bbox"]
+        is_ball = tracks.object_mask("ball")
+        x = np.trunc((bbox[:, 0] + bbox[:, 2]) / 2)
+        y = np.where(is_ball, np.trunc((bbox[:, 1] + bbox[:, 3]) / 2), np.trunc(bbox[:, 3]))
+        tracks["position"] = np.stack([x, y], axis=1)
+
+    def interpolate_ball_positions(self,tracks,max_gap=None,smooth=False,process_noise=1.0,measurement_noise=4.0):
+        """在 (num_frames, 4) 的球 bbox 数组上直接插值缺失帧
+
+        max_gap: 超过这么多（处理）帧的缺失段不插值，避免跨越长时间遮挡；None 表示全部插值
+        smooth: 用恒速卡尔曼 + RTS 平滑替代首尾观测之间的线性插值，同时平滑检测抖动
+        """
+        ball_positions = tracks.ball_bboxes()
+        filled = interpolate_gaps(ball_positions, max_gap)
+        if smooth:
+            smoothed = smooth_constant_velocity(ball_positions, process_noise, measurement_noise)
+            inside = ~np.isnan(smoothed).any(axis=1) & ~np.isnan(filled).any(axis=1)
+            filled[inside] = smoothed[inside]
+
+        tracks.set_ball_bboxes(filled)
 
-        ball_positions = [{1: {"bbox":x}} for x in df_ball_positions.to_numpy().tolist()]
-
-        return ball_positions
+        return tracks
 
     def detect_frames(self, frames):
+        """批量检测；被运动门控跳过的帧在结果中为 None，由 add_detections_to_tracks 外推"""
         print_debug_info(f"开始检测 {len(frames)} 帧视频内容")
-        batch_size=20
-        detections = []
-        processed_frames = 0
-        
+        detect_indices = [i for i, frame in enumerate(frames) if self.motion_gate.should_detect(frame)]
+        if len(detect_indices) < len(frames):
+            print_debug_info(f"运动门控跳过 {len(frames) - len(detect_indices)}/{len(frames)} 帧")
+        detections = [None] * len(frames)
+        batch_count = 0
+
         # 使用tqdm显示检测进度
-        with tqdm(total=len(frames), desc="视频帧检测", unit="帧") as pbar:
-            for i in range(0,len(frames),batch_size):
-                batch_end = min(i + batch_size, len(frames))
-                current_batch_size = batch_end - i
-                
+        with tqdm(total=len(detect_indices), desc="视频帧检测", unit="帧") as pbar:
+            i = 0
+            while i < len(detect_indices):
+                # 批大小可能在出错重试后变小，每个批次重新读取
+                batch_size = self.batch_size
+                batch_end = min(i + batch_size, len(detect_indices))
+                batch_indices = detect_indices[i:batch_end]
+
                 # 每处理5个批次打印一次进度信息
-                if i % (batch_size * 5) == 0:
-                    print_debug_info(f"检测批次 {i//batch_size + 1}, 处理帧范围: {i}-{batch_end-1}")
-                
-                try:
-                    detections_batch = self.model.predict(frames[i:i+batch_size],conf=0.1)
-                    detections += detections_batch
-                except Exception as e:
-                    print_debug_info(f"检测批次 {i//batch_size + 1} 出错: {str(e)}")
-                    # 添加空结果以保持帧数一致
-                    for _ in range(current_batch_size):
-                        detections.append(None)
-                
-                pbar.update(current_batch_size)
-                processed_frames += current_batch_size
-        
-        print_debug_info(f"完成视频帧检测，成功处理 {len([d for d in detections if d is not None])}/{len(frames)} 帧")
-        return detections
+                if batch_count % 5 == 0:
+                    print_debug_info(f"检测批次 {batch_count + 1}, 处理帧范围: {batch_indices[0]}-{batch_indices[-1]}")
 
+                for frame_index, detection in zip(batch_indices,
+                                                  self.predict_batch([frames[j] for j in batch_indices])):
+                    detections[frame_index] = detection
+                pbar.update(len(batch_indices))
+                batch_count += 1
+                i = batch_end
 
-    def get_object_tracks(self, frames, read_from_stub=None, stub_path=None): #25.2.24改过 read_from_stub 从False到None
-        print_debug_info(f"开始获取目标跟踪信息，帧数: {len(frames)}")
-        
-        if read_from_stub and stub_path is not None and os.path.exists(stub_path): #检查是否已有缓存文件
-            print_debug_info(f"从缓存文件加载跟踪数据: {stub_path}")
-            with open(stub_path,'rb') as f:
-                tracks = pickle.load(f)
-            return tracks
+        if self.ball_detector is not None:
+            self.refine_ball_detections(frames, detections)
+
+        print_debug_info(f"完成视频帧检测，检测 {len(detect_indices)}/{len(frames)} 帧")
+        return detections
 
+    def refine_ball_detections(self, frames, detections):
+        """逐帧推进球的卡尔曼滤波；整帧检测没有球的帧在预测位置附近裁剪再找一次，找到的球追加到该帧结果中"""
+        roi_hits = self.ball_detector.roi_hits
+        for frame, detection in zip(frames, detections):
+            center = self.ball_detector.predict()
+            # 运动门控跳过的帧只推进滤波器
+            if detection is None:
+                continue
+            if self.ball_detector.ball_class_id is None:
+                self.ball_detector.ball_class_id = {v: k for k, v in detection.names.items()}['ball']
+            ball = self.ball_detector.best_ball(detection)
+            if ball is None and center is not None:
+                ball = self.ball_detector.search_roi(frame, center)
+                if ball is not None:
+                    bbox, conf = ball
+                    data = detection.boxes.data
+                    row = torch.tensor([[*bbox, conf, self.ball_detector.ball_class_id]],
+                                       dtype=data.dtype, device=data.device)
+                    detection.update(boxes=torch.cat([data, row]))
+            self.ball_detector.observe(ball)
+        if self.ball_detector.roi_hits > roi_hits:
+            print_debug_info(f"球 ROI 搜索补回 {self.ball_detector.roi_hits - roi_hits} 帧的球")
+
+    def extrapolate_outputs(self, frame_num):
+        """按最近两次检测帧的恒速运动外推 frame_num 帧的目标框；只出现过一次的目标保持原位"""
+        if not self.recent_outputs:
+            return {}
+        last_frame, last_boxes = self.recent_outputs[-1]
+        if len(self.recent_outputs) < 2:
+            return dict(last_boxes)
+        previous_frame, previous_boxes = self.recent_outputs[0]
+        step = (frame_num - last_frame) / (last_frame - previous_frame)
+        return {key: bbox + (bbox - previous_boxes[key]) * step if key in previous_boxes else bbox
+                for key, bbox in last_boxes.items()}
+
+    def track_frames(self, frames, tracks):
+        """检测并跟踪一段连续帧，结果追加到 tracks 中；ByteTrack 状态跨调用保留，可逐块调用"""
         print_debug_info("开始检测视频帧中的对象")
         detections = self.detect_frames(frames)
+        return self.add_detections_to_tracks(detections, tracks)
 
-        tracks={
-            "players":[],
-            "referees":[],
-            "ball":[]
-        }
+    def track_chunks(self, chunks, tracks, queue_size=2):
+        """流水线执行：后台线程解码 → 后台线程 YOLO 检测 → 当前线程 ByteTrack 跟踪
+
+        chunks 为 (帧号列表, 帧列表) 的可迭代对象（如 SampledVideoReader），各阶段之间用
+        容量为 queue_size 的队列连接。逐块产出 (帧号列表, 帧列表, 该块首帧在 tracks 中的下标)，
+        调用方可以在帧仍驻留内存时继续做相机运动估计、队伍分配等需要像素的步骤。
+        """
+        def detect(chunk):
+            frame_indices, frames = chunk
+            return frame_indices, frames, self.detect_frames(frames)
+
+        for frame_indices, frames, detections in threaded_map(detect, prefetch(chunks, queue_size), queue_size):
+            first_frame_num = tracks.num_frames
+            self.add_detections_to_tracks(detections, tracks)
+            yield frame_indices, frames, first_frame_num
+
+    def add_detections_to_tracks(self, detections, tracks):
+        """用 ByteTrack 跟踪一段连续帧的检测结果，并追加到 tracks 中"""
+        frame_offset = tracks.num_frames
 
         # 使用tqdm显示进度
         with tqdm(total=len(detections), desc="处理视频帧跟踪", unit="帧") as pbar:
@@ -101,7 +324,17 @@ class Tracker:
                 # 每处理10帧打印一次进度信息
                 if frame_num % 10 == 0:
                     print_debug_info(f"处理帧 {frame_num}/{len(detections)}")
-                    
+
+                current_frame = frame_offset + frame_num
+                tracks.num_frames = current_frame + 1
+
+                if detection is None:
+                    # 运动门控跳过的帧：不更新 ByteTrack，沿用外推的目标框和 track_id
+                    for (object_name, track_id), bbox in self.extrapolate_outputs(current_frame).items():
+                        tracks.append_rows(object_name, [current_frame], [track_id], bbox[None])
+                    pbar.update(1)
+                    continue
+
                 cls_names = detection.names
                 cls_names_inv = {v:k for k,v in cls_names.items()}
 
@@ -116,33 +349,55 @@ class Tracker:
                 # Track Objects
                 detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
 
-                tracks["players"].append({})
-                tracks["referees"].append({})
-                tracks["ball"].append({})
-
-                for frame_detection in detection_with_tracks:
-                    bbox = frame_detection[0].tolist()
-                    cls_id = frame_detection[3]
-                    track_id = frame_detection[4]
-
-                    if cls_id == cls_names_inv['player']:
-                        tracks["players"][frame_num][track_id] = {"bbox":bbox}
-                    
-                    if cls_id == cls_names_inv['referee']:
-                        tracks["referees"][frame_num][track_id] = {"bbox":bbox}
-                
-                for frame_detection in detection_supervision:
-                    bbox = frame_detection[0].tolist()
-                    cls_id = frame_detection[3]
-
-                    if cls_id == cls_names_inv['ball']:
-                        tracks["ball"][frame_num][1] = {"bbox":bbox}
+                outputs = {}
+                for object_name, cls_name in (("players", "player"), ("referees", "referee")):
+                    mask = detection_with_tracks.class_id == cls_names_inv[cls_name]
+                    tracks.append_rows(object_name,
+                                       np.full(np.count_nonzero(mask), current_frame),
+                                       detection_with_tracks.tracker_id[mask],
+                                       detection_with_tracks.xyxy[mask])
+                    if self.motion_gate.enabled:
+                        outputs.update(((object_name, int(track_id)), bbox) for track_id, bbox in
+                                       zip(detection_with_tracks.tracker_id[mask], detection_with_tracks.xyxy[mask]))
+
+                # 球不参与跟踪，每帧只保留置信度最高的一个检测（与球卡尔曼滤波采用的相同），track_id 固定为 1
+                ball_indices = np.flatnonzero(detection_supervision.class_id == cls_names_inv['ball'])
+                if len(ball_indices):
+                    best = ball_indices[np.argmax(detection_supervision.confidence[ball_indices])]
+                    tracks.append_rows("ball", [current_frame], [1], detection_supervision.xyxy[best][None])
+                    outputs[("ball", 1)] = detection_supervision.xyxy[best]
+
+                if self.motion_gate.enabled:
+                    self.recent_outputs = self.recent_outputs[-1:] + [(current_frame, outputs)]
                         
                 pbar.update(1)
 
+        return tracks
+
+    def get_object_tracks(self, frames, read_from_stub=None, stub_path=None): #25.2.24改过 read_from_stub 从False到None
+        print_debug_info(f"开始获取目标跟踪信息，帧数: {len(frames)}")
+        
+        # 跟踪数据写到同名的 .npz；stub_path 本身（例如 .pkl）只用于读取旧版缓存
+        if read_from_stub and stub_path is not None and os.path.exists(npz_path(stub_path)):
+            print_debug_info(f"从缓存文件加载跟踪数据: {npz_path(stub_path)}")
+            return TrackTable.load(npz_path(stub_path))
+        if read_from_stub and stub_path is not None and os.path.exists(stub_path): #检查是否已有缓存文件
+            print_debug_info(f"从缓存文件加载跟踪数据: {stub_path}")
+            if zipfile.is_zipfile(stub_path):
+                return TrackTable.load(stub_path)
+            # 兼容旧版 pickle 缓存（嵌套字典格式）
+            with open(stub_path,'rb') as f:
+                tracks = pickle.load(f)
+            if isinstance(tracks, dict):
+                tracks = TrackTable.from_tracks(tracks)
+            return tracks
+
+        tracks = TrackTable()
+        self.track_frames(frames, tracks)
+
         if stub_path is not None:
-            with open(stub_path,'wb') as f:
-                pickle.dump(tracks,f)
+            # 按列保存为 .npz，下游可以只内存映射需要的列
+            tracks.save(npz_path(stub_path))
 
         return tracks
     
@@ -212,68 +467,20 @@ class Tracker:
             lineType=cv2.LINE_4
         )
 
-        # 椭圆中心的矩形
-        rectangle_width = int(0.6 * width)
-        rectangle_height = int(0.4 * width)
-        x1_rect = x_center - rectangle_width // 2
-        x2_rect = x_center + rectangle_width // 2
-        y1_rect = (y2 - rectangle_height // 2) + 15
-        y2_rect = (y2 + rectangle_height // 2) + 15
-
         if track_id is not None:
-            cv2.rectangle(
-                frame,
-                (int(x1_rect), int(y1_rect)),
-                (int(x2_rect), int(y2_rect)),
-                color,
-                cv2.FILLED
-            )
-
-            # 动态计算字体大小和位置
-            text = str(track_id)
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            initial_scale = 1.0  # 初始字体缩放比例
-            thickness = 2  # 初始线条粗细
-
-            # 计算允许的最大文本尺寸（考虑边距）
-            margin_x, margin_y = 5, 5
-            max_text_width = rectangle_width - 2 * margin_x
-            max_text_height = rectangle_height - 2 * margin_y
-
-            # 获取初始文本尺寸
-            (text_width, text_height), baseline = cv2.getTextSize(text, font, initial_scale, thickness)
-            text_total_height = text_height + baseline  # 包含基线高度的总高度
-
-            # 动态调整缩放比例
-            if text_width > max_text_width or text_total_height > max_text_height:
-                width_ratio = max_text_width / text_width
-                height_ratio = max_text_height / text_total_height
-                scale = initial_scale * min(width_ratio, height_ratio)
+            # 椭圆中心的矩形
+            rectangle_width = int(0.6 * width)
+            rectangle_height = int(0.4 * width)
+            x1_rect = x_center - rectangle_width // 2
+            y1_rect = (y2 - rectangle_height // 2) + 15
+
+            if self.cache_badges:
+                badge_color = tuple(int(round(c)) for c in color)
+                sprite, mask = render_id_badge(int(track_id), rectangle_width, rectangle_height, badge_color)
+                blit_sprite(frame, sprite, mask, x1_rect - BADGE_PADDING, y1_rect - BADGE_PADDING)
             else:
-                scale = initial_scale
-
-            # 重新计算调整后的文本尺寸
-            (text_width, text_height), baseline = cv2.getTextSize(text, font, scale, thickness)
-            text_total_height = text_height + baseline
-
-            # 计算文本位置（居中）
-            x_center_rect = x1_rect + rectangle_width // 2
-            y_center_rect = y1_rect + rectangle_height // 2
-            x_text = x_center_rect - text_width // 2
-            y_text = y_center_rect + (text_height - baseline) // 2  # 垂直居中调整
-
-            # 根据缩放比例调整线条粗细
-            adjusted_thickness = max(1, int(thickness * scale))
-
-            cv2.putText(
-                frame,
-                text,
-                (int(x_text), int(y_text)),
-                font,
-                scale,
-                (0, 0, 0),
-                adjusted_thickness
-            )
+                draw_id_badge(frame, x1_rect, y1_rect, rectangle_width, rectangle_height,
+                              str(track_id), color, (0, 0, 0))
 
         return frame
 
@@ -291,71 +498,63 @@ class Tracker:
 
         return frame
 
-    def draw_team_ball_control(self,frame,frame_num,team_ball_control):
-        # Draw a semi-transparent rectaggle 
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 100), (500,200), (255,255,255), -1 )
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        team_ball_control_till_frame = team_ball_control[:frame_num+1]
-        # Get the number of time each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==2].shape[0]
-        
-        # 防止除零错误
+    def get_team_ball_control_percentages(self,team_ball_control):
+        """用前缀和一次算出每帧截至当前的两队控球比例，返回 (N,2)"""
+        team_ball_control = np.asarray(team_ball_control)
+        team_1_num_frames = np.cumsum(team_ball_control == 1)
+        team_2_num_frames = np.cumsum(team_ball_control == 2)
         total_frames = team_1_num_frames + team_2_num_frames
-        if total_frames == 0:
-            team_1 = 0.0
-            team_2 = 0.0
-        else:
-            team_1 = team_1_num_frames / total_frames
-            team_2 = team_2_num_frames / total_frames
+        # 防止除零错误
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentages = np.stack([team_1_num_frames / total_frames, team_2_num_frames / total_frames], axis=1)
+        percentages[total_frames == 0] = 0.0
+        return percentages
+
+    def draw_team_ball_control(self,frame,frame_num,team_ball_control_percentages):
+        # Draw a semi-transparent rectaggle，只混合矩形所在区域
+        blend_rectangle(frame, (0, 100), (500, 200), (255, 255, 255), 0.4)
+
+        team_1, team_2 = team_ball_control_percentages[frame_num]
 
         cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%",(10,130), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,0), 3)
         cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%",(10,160), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,0), 3)
 
         return frame
 
-    def draw_annotations(self,video_frames, tracks,team_ball_control): #画圆圈
-        output_video_frames= []
-        for frame_num, frame in enumerate(video_frames):
-
-            #enumerate用例
-            # seasons = ['Spring', 'Summer', 'Fall', 'Winter']
-            # >> > list(enumerate(seasons))
-            # [(0, 'Spring'), (1, 'Summer'), (2, 'Fall'), (3, 'Winter')]
-            # >> > list(enumerate(seasons, start=1))  # 下标从 1 开始
-            # [(1, 'Spring'), (2, 'Summer'), (3, 'Fall'), (4, 'Winter')]
+    def draw_frame_annotations(self,frame,frame_num,tracks,team_ball_control_percentages):
+        """在单帧上原地绘制球员、裁判、球和控球面板，可注册到 FrameRenderer"""
+        player_dict = tracks["players"][frame_num]
+        ball_dict = tracks["ball"][frame_num]
+        referee_dict = tracks["referees"][frame_num]
 
+        # Draw Players
+        for track_id, player in player_dict.items():
+            color = player.get("team_color",(0,0,255))
+            frame = self.draw_ellipse(frame, player["bbox"],color, track_id)
 
+            if player.get('has_ball',False):
+                frame = self.draw_traingle(frame, player["bbox"],(0,255,0))
 
-            frame = frame.copy()
-
-            player_dict = tracks["players"][frame_num]
-            ball_dict = tracks["ball"][frame_num]
-            referee_dict = tracks["referees"][frame_num]
-
-            # Draw Players
-            for track_id, player in player_dict.items():
-                color = player.get("team_color",(0,0,255))
-                frame = self.draw_ellipse(frame, player["bbox"],color, track_id)
-
-                if player.get('has_ball',False):
-                    frame = self.draw_traingle(frame, player["bbox"],(0,255,0))
+        # Draw Referee
+        for _, referee in referee_dict.items():
+            frame = self.draw_ellipse(frame, referee["bbox"],(0,255,255))
+        
+        # Draw ball 
+        for track_id, ball in ball_dict.items():
+            frame = self.draw_traingle(frame, ball["bbox"],(255,255,255))
 
-            # Draw Referee
-            for _, referee in referee_dict.items():
-                frame = self.draw_ellipse(frame, referee["bbox"],(0,255,255))
-            
-            # Draw ball 
-            for track_id, ball in ball_dict.items():
-                frame = self.draw_traingle(frame, ball["bbox"],(255,255,255))
 
+        # Draw Team Ball Control
+        frame = self.draw_team_ball_control(frame, frame_num, team_ball_control_percentages)
 
-            # Draw Team Ball Control
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
+        return frame
 
+    def draw_annotations(self,video_frames, tracks,team_ball_control_percentages,frame_offset=0): #画圆圈
+        # team_ball_control_percentages 由 get_team_ball_control_percentages 预先计算
+        # frame_offset: video_frames[0] 在整段视频中的帧号，用于分块绘制
+        output_video_frames= []
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            frame = self.draw_frame_annotations(frame.copy(), frame_num, tracks, team_ball_control_percentages)
             output_video_frames.append(frame)
 
-        return output_video_frames
\ No newline at end of file
+        return output_video_frames
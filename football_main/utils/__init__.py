@@ -1,2 +1,10 @@
-from .video_utils import read_video, save_video
-from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance,measure_xy_distance,get_foot_position
\ No newline at end of file
+from .video_utils import read_video, read_video_chunks, SampledVideoReader, get_video_info, open_video_writer, save_video
+from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance,measure_xy_distance,get_foot_position, box_iou, match_rate
+from .timeline_utils import KeyframeTimeline
+from .pipeline_utils import threaded_map, prefetch
+from .track_table import TrackTable, load_track_columns
+from .overlay_utils import blend_overlay, blend_rectangle
+from .render_utils import FrameRenderer
+from .stage_cache import StageCache, file_hash, save_npz, load_npz, npz_path
+from .interpolation_utils import interpolate_gaps, smooth_constant_velocity, gap_lengths
+from .calibration_utils import build_calibration_dataset, calibration_data, export_int8_openvino
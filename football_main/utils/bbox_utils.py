@@ -1,3 +1,5 @@
+import numpy as np
+
 def get_center_of_bbox(bbox):
     x1,y1,x2,y2 = bbox
     return int((x1+x2)/2),int((y1+y2)/2)
@@ -13,4 +15,28 @@ def measure_xy_distance(p1,p2):
 
 def get_foot_position(bbox):
     x1,y1,x2,y2 = bbox
-    return int((x1+x2)/2),int(y2)
\ No newline at end of file
+    return int((x1+x2)/2),int(y2)
+
+def box_iou(boxes_a, boxes_b):
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def match_rate(reference, detections, iou_threshold=0.5):
+    """reference 中能在 detections 里找到同类别且 IoU 超过阈值的框的比例
+
+    reference / detections 为逐帧的 (xyxy 数组, 类别数组) 列表
+    """
+    matched, total = 0, 0
+    for (ref_boxes, ref_classes), (boxes, classes) in zip(reference, detections):
+        total += len(ref_boxes)
+        if len(ref_boxes) == 0 or len(boxes) == 0:
+            continue
+        iou = box_iou(ref_boxes, boxes)
+        iou[ref_classes[:, None] != classes[None, :]] = 0
+        matched += int(np.count_nonzero(iou.max(axis=1) > iou_threshold))
+    return matched / total if total else 1.0
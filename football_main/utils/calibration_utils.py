@@ -0,0 +1,129 @@
+import os
+import json
+import shutil
+import hashlib
+import cv2
+import numpy as np
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+# 校准数据集目录和 INT8 导出目录中记录校准来源签名的文件
+SIGNATURE_FILE = 'calibration_source.txt'
+
+
+def _list_sources(source):
+    if os.path.isfile(source):
+        return [source]
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f"校准数据不存在: {source}")
+    return sorted(os.path.join(source, name) for name in os.listdir(source)
+                  if name.lower().endswith(VIDEO_EXTENSIONS + IMAGE_EXTENSIONS))
+
+
+def calibration_signature(source):
+    """校准来源的签名：绝对路径 + 每个视频/图片（或 data.yaml）的大小和修改时间，来源变化时缓存失效"""
+    paths = [source] if source.endswith(('.yaml', '.yml')) else _list_sources(source)
+    digest = hashlib.sha1(os.path.abspath(source).encode('utf-8'))
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"|{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _read_signature(directory):
+    try:
+        with open(os.path.join(directory, SIGNATURE_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write_signature(directory, signature):
+    with open(os.path.join(directory, SIGNATURE_FILE), 'w', encoding='utf-8') as f:
+        f.write(signature + "\n")
+
+
+def _sample_video_frames(video_path, count):
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    try:
+        for frame_num in np.unique(np.linspace(0, max(frame_count - 1, 0), count).astype(int)):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_num))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+def build_calibration_dataset(source, output_dir, class_names, num_images=300):
+    """从视频中均匀抽帧（图片则直接使用）生成 INT8 校准数据集，返回 ultralytics 可用的 data.yaml 路径
+
+    source 可以是视频/图片文件，或包含它们的目录（例如 input_videos）。校准只需要图片，
+    不需要标注，train / val 都指向同一个图片目录。output_dir 下已有由同一来源生成的 data.yaml 时直接复用，
+    来源变化时重新生成。
+    """
+    yaml_path = os.path.join(output_dir, 'data.yaml')
+    signature = calibration_signature(source)
+    if os.path.exists(yaml_path) and _read_signature(output_dir) == signature:
+        return yaml_path
+
+    sources = _list_sources(source)
+    videos = [path for path in sources if path.lower().endswith(VIDEO_EXTENSIONS)]
+    images = [path for path in sources if path.lower().endswith(IMAGE_EXTENSIONS)]
+    image_dir = os.path.join(output_dir, 'images')
+    shutil.rmtree(image_dir, ignore_errors=True)
+    os.makedirs(image_dir, exist_ok=True)
+
+    count = 0
+    per_video = -(-max(num_images - len(images), 0) // max(len(videos), 1))
+    for video_path in videos:
+        for frame in _sample_video_frames(video_path, per_video):
+            cv2.imwrite(os.path.join(image_dir, f"{count:05d}.jpg"), frame)
+            count += 1
+    for image_path in images[:num_images]:
+        frame = cv2.imread(image_path)
+        if frame is not None:
+            cv2.imwrite(os.path.join(image_dir, f"{count:05d}.jpg"), frame)
+            count += 1
+    if count == 0:
+        raise FileNotFoundError(f"没有从 {source} 中读取到任何校准图片")
+
+    # JSON 字符串同时也是合法的 YAML 标量，类别名中的特殊字符无需额外转义
+    lines = [f"path: {json.dumps(os.path.abspath(output_dir))}", "train: images", "val: images", "names:"]
+    names = class_names.items() if isinstance(class_names, dict) else enumerate(class_names)
+    lines += [f"  {class_id}: {json.dumps(name, ensure_ascii=False)}" for class_id, name in names]
+    with open(yaml_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    _write_signature(output_dir, signature)
+    return yaml_path
+
+
+def calibration_data(model_path, class_names, calibration_source):
+    """返回 INT8 校准用的 data.yaml：已是 yaml 则直接使用，否则从视频/图片目录抽帧生成并缓存在 .pt 旁边"""
+    if calibration_source.endswith(('.yaml', '.yml')):
+        return calibration_source
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(model_path)), 'int8_calibration')
+    return build_calibration_dataset(calibration_source, output_dir, class_names)
+
+
+def export_int8_openvino(model_path, calibration_source, imgsz=640, task="detect", **export_kwargs):
+    """校准并导出 INT8 OpenVINO 模型，缓存在 .pt 旁边（best_int8_openvino_model/）
+
+    已有导出产物不旧于 .pt 且由同一校准来源生成时直接复用。football_main 和 Offside detection
+    共用这一实现；ultralytics 在调用时才导入，使用调用方已加载的版本。
+    """
+    export_path = os.path.splitext(model_path)[0] + "_int8_openvino_model"
+    signature = calibration_signature(calibration_source)
+    if (os.path.exists(export_path) and os.path.getmtime(export_path) >= os.path.getmtime(model_path)
+            and _read_signature(export_path) == signature):
+        return export_path
+
+    from ultralytics import YOLO
+    model = YOLO(model_path, task=task)
+    exported = str(model.export(format="openvino", imgsz=imgsz, int8=True,
+                                data=calibration_data(model_path, model.names, calibration_source), **export_kwargs))
+    _write_signature(exported, signature)
+    return exported
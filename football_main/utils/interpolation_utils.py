@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def _neighbour_valid(valid):
+    """每帧之前（含自身）和之后（含自身）最近的有效帧号，不存在时分别为 -1 和 N"""
+    num_frames = len(valid)
+    index = np.arange(num_frames)
+    prev_valid = np.maximum.accumulate(np.where(valid, index, -1))
+    next_valid = np.minimum.accumulate(np.where(valid, index, num_frames)[::-1])[::-1]
+    return prev_valid, next_valid
+
+
+def gap_lengths(valid):
+    """每帧所在的连续缺失段长度，有效帧为 0；开头、结尾的缺失段同样按其长度计算"""
+    valid = np.asarray(valid, dtype=bool)
+    prev_valid, next_valid = _neighbour_valid(valid)
+    return np.where(valid, 0, next_valid - prev_valid - 1)
+
+
+def interpolate_gaps(values, max_gap=None):
+    """对 (N, D) 数组中整行为 NaN 的帧按帧号线性插值
+
+    开头、结尾的缺失帧取最近的有效值，与 pandas 的 interpolate() + bfill() 结果相同。
+    max_gap 不为 None 时，长于 max_gap 帧的缺失段保持 NaN，不跨越长时间遮挡插值。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values).any(axis=1)
+    if valid.all() or not valid.any():
+        return values.copy()
+
+    # 所有维度一次插值：每帧取前后最近的有效帧，按帧号距离加权
+    prev_valid, next_valid = _neighbour_valid(valid)
+    num_frames = len(values)
+    prev_index = np.where(prev_valid < 0, next_valid, prev_valid)
+    next_index = np.where(next_valid >= num_frames, prev_index, next_valid)
+    span = next_index - prev_index
+    t = np.divide(np.arange(num_frames) - prev_index, span, out=np.zeros(num_frames), where=span > 0)
+    filled = values[prev_index] + (values[next_index] - values[prev_index]) * t[:, None]
+    if max_gap is not None:
+        filled[np.where(valid, 0, next_valid - prev_valid - 1) > max_gap] = np.nan
+    return filled
+
+
+def smooth_constant_velocity(values, process_noise=1.0, measurement_noise=4.0):
+    """恒速模型的卡尔曼滤波 + RTS 平滑，对 (N, D) 数组的每一维独立处理
+
+    NaN 帧只做预测不做更新，因此缺失帧得到的是前后观测约束下的平滑估计。
+    各维共用同一个运动模型和缺失模式，2x2 协方差与增益只按标量计算一遍，
+    状态递推再对所有维度一起做。第一个观测之前、最后一个观测之后的帧返回 NaN。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    smoothed = np.full_like(values, np.nan)
+    valid = ~np.isnan(values).any(axis=1)
+    known = np.flatnonzero(valid)
+    if len(known) == 0:
+        return smoothed
+
+    start, end = int(known[0]), int(known[-1]) + 1
+    observed = valid[start:end].tolist()
+    measurements = values[start:end]
+    # 状态 [位置, 速度]，单位时间步，F = [[1, 1], [0, 1]]；Q 为离散白噪声加速度模型
+    q00, q01, q11 = 0.25 * process_noise, 0.5 * process_noise, float(process_noise)
+    r = float(measurement_noise)
+
+    # 前向：协方差 (p00, p01, p11) 为标量递推，记录每步的增益和 RTS 需要的平滑增益
+    gains = []
+    smoother_gains = []
+    # 初始位置取第一个观测，先验方差取很大的值，由第一个观测更新
+    p00, p01, p11 = 1e4, 0.0, 1e4
+    for step, has_measurement in enumerate(observed):
+        if step > 0:
+            # 预测协方差 F P F^T + Q
+            a00 = p00 + 2 * p01 + p11 + q00
+            a01 = p01 + p11 + q01
+            a11 = p11 + q11
+            # RTS 平滑增益 C = P_prev F^T P_pred^-1
+            det = a00 * a11 - a01 * a01
+            f00, f01, f10, f11 = p00 + p01, p01, p01 + p11, p11
+            smoother_gains.append(((f00 * a11 - f01 * a01) / det, (f01 * a00 - f00 * a01) / det,
+                                   (f10 * a11 - f11 * a01) / det, (f11 * a00 - f10 * a01) / det))
+            p00, p01, p11 = a00, a01, a11
+        if has_measurement:
+            k0, k1 = p00 / (p00 + r), p01 / (p00 + r)
+            p00, p01, p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+        else:
+            k0, k1 = 0.0, 0.0
+        gains.append((k0, k1))
+
+    position = measurements[0].copy()
+    velocity = np.zeros_like(position)
+    filtered = np.empty((end - start, 2, values.shape[1]))
+    predicted = np.empty_like(filtered)
+    for step, (k0, k1) in enumerate(gains):
+        if step > 0:
+            position = position + velocity
+        predicted[step, 0], predicted[step, 1] = position, velocity
+        if observed[step]:
+            innovation = measurements[step] - position
+            position = position + k0 * innovation
+            velocity = velocity + k1 * innovation
+        filtered[step, 0], filtered[step, 1] = position, velocity
+
+    # 反向 RTS 平滑
+    position, velocity = filtered[-1]
+    smoothed[end - 1] = position
+    for step in range(end - start - 2, -1, -1):
+        c00, c01, c10, c11 = smoother_gains[step]
+        dp = position - predicted[step + 1, 0]
+        dv = velocity - predicted[step + 1, 1]
+        position, velocity = (filtered[step, 0] + c00 * dp + c01 * dv,
+                              filtered[step, 1] + c10 * dp + c11 * dv)
+        smoothed[start + step] = position
+    return smoothed
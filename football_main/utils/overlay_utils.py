@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+
+
+def blend_overlay(frame, region, draw, alpha, additive=False):
+    """只在 region 范围内合成半透明覆盖层，原地修改 frame
+
+    region: (x1, y1, x2, y2)，包含 draw 画到的全部像素（含边界），超出画面的部分会被裁掉。
+    draw(overlay, origin): 在覆盖层上作画，overlay 只有 region 大小，绘制坐标需减去 origin=(x1, y1)。
+    additive=False: 覆盖层初始为画面副本，结果为 overlay*alpha + frame*(1-alpha)，
+                    等价于 frame.copy() 后画图再整帧 addWeighted；
+    additive=True:  覆盖层初始为全黑，结果为 frame + overlay*alpha，
+                    等价于 np.zeros_like(frame) 上画图再整帧 addWeighted(frame, 1, overlay, alpha)。
+    region 之外的像素在两种方式下都保持不变，因此只需要处理 region 内的像素。
+    """
+    height, width = frame.shape[:2]
+    x1, y1 = max(int(region[0]), 0), max(int(region[1]), 0)
+    x2, y2 = min(int(region[2]), width - 1), min(int(region[3]), height - 1)
+    if x1 > x2 or y1 > y2:
+        return frame
+
+    roi = frame[y1:y2 + 1, x1:x2 + 1]
+    overlay = np.zeros_like(roi) if additive else roi.copy()
+    draw(overlay, (x1, y1))
+    if additive:
+        cv2.addWeighted(roi, 1, overlay, alpha, 0, roi)
+    else:
+        cv2.addWeighted(overlay, alpha, roi, 1 - alpha, 0, roi)
+    return frame
+
+
+def blend_rectangle(frame, top_left, bottom_right, color, alpha):
+    """原地绘制半透明实心矩形，效果与 cv2.rectangle(..., -1) 后整帧 addWeighted 相同"""
+    def draw(overlay, origin):
+        overlay[:] = color
+
+    return blend_overlay(frame, (*top_left, *bottom_right), draw, alpha)
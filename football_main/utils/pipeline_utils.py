@@ -0,0 +1,53 @@
+import queue
+import threading
+
+
+def _put(q, item, stop):
+    # 队列满时等待，下游提前退出（stop 被设置）时放弃
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def threaded_map(func, iterable, maxsize=2):
+    """在后台线程中对 iterable 的每一项执行 func，结果经有界队列按顺序交给调用方
+
+    用于把解码、检测、绘制等阶段串成生产者/消费者流水线：OpenCV 和 torch 的调用会释放 GIL，
+    各阶段可以在多核上重叠执行；maxsize 限制每个阶段最多缓存的块数，内存占用保持有界。
+    后台线程中的异常会在调用方重新抛出。
+    """
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def worker():
+        try:
+            for item in iterable:
+                if not _put(q, ("item", func(item)), stop):
+                    return
+        except BaseException as e:
+            _put(q, ("error", e), stop)
+            return
+        _put(q, ("done", None), stop)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = q.get()
+            if kind == "done":
+                break
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+        thread.join()
+
+
+def prefetch(iterable, maxsize=2):
+    """在后台线程中提前迭代 iterable（例如视频解码），最多缓存 maxsize 项"""
+    return threaded_map(lambda item: item, iterable, maxsize)
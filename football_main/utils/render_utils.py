@@ -0,0 +1,20 @@
+class FrameRenderer:
+    """可组合的单遍渲染器：各标注器注册逐帧绘制回调，每帧按注册顺序原地绘制一次
+
+    回调签名为 draw(frame, frame_num) -> frame，frame_num 为该帧在整段视频中的帧号。
+    绘制直接作用在解码得到的帧上，不再为每个标注器复制整段视频。
+    """
+    def __init__(self):
+        self.draw_callbacks = []
+
+    def register(self, draw):
+        self.draw_callbacks.append(draw)
+        return self
+
+    def render(self, frame, frame_num):
+        for draw in self.draw_callbacks:
+            frame = draw(frame, frame_num)
+        return frame
+
+    def render_chunk(self, frames, frame_offset=0):
+        return [self.render(frame, frame_num) for frame_num, frame in enumerate(frames, start=frame_offset)]
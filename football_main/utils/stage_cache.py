@@ -0,0 +1,140 @@
+import os
+import gc
+import json
+import struct
+import hashlib
+import zipfile
+import weakref
+import functools
+import numpy as np
+
+_NPY_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+# 本进程中 load_npz 创建的内存映射 {绝对路径: [weakref]}。
+# Windows 上仍被映射的文件不能被 os.replace 覆盖，写入前要确认映射都已释放
+_mappings = {}
+
+
+def _live_mappings(path):
+    path = os.path.abspath(path)
+    refs = [ref for ref in _mappings.get(path, []) if ref() is not None]
+    if refs:
+        _mappings[path] = refs
+    else:
+        _mappings.pop(path, None)
+    return len(refs)
+
+
+def save_npz(path, arrays):
+    """把 {名称: 数组} 保存为未压缩的 .npz；先写临时文件再原子替换
+
+    目标文件仍被本进程内存映射时先回收只被引用环持有的映射；Windows 上仍有映射则报错，
+    调用方需先释放 load_npz 返回的数组（POSIX 上替换后旧映射继续指向旧文件内容，不受影响）。
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    if _live_mappings(path):
+        gc.collect()
+        if _live_mappings(path) and os.name == 'nt':
+            os.remove(tmp_path)
+            raise OSError(f"{path} 仍被内存映射，无法覆盖；请先释放 load_npz 返回的数组")
+    os.replace(tmp_path, path)
+    return path
+
+
+def npz_path(path):
+    """把 stub 路径（例如旧的 stubs/track_stubs.pkl）换成同名的 .npz 路径；旧路径只用于读取旧版缓存"""
+    return os.path.splitext(path)[0] + '.npz'
+
+
+def load_npz(path, names=None, mmap=True):
+    """读取 .npz，返回 {名称: 数组}；names 指定时只读取这些数组
+
+    np.load 对 .npz 不支持 mmap_mode。未压缩（ZIP_STORED）的成员在文件中是连续存放的，
+    mmap=True 时直接按偏移量做只读内存映射，只有真正访问到的列才会从磁盘读入。
+    压缩成员、标量和空数组退回普通读取。
+    """
+    arrays = {}
+    with open(path, 'rb') as raw, zipfile.ZipFile(raw) as archive:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if names is not None and name not in names:
+                continue
+            with archive.open(info) as f:
+                version = np.lib.format.read_magic(f)
+                read_header = _NPY_HEADER_READERS.get(version)
+                if not mmap or info.compress_type != zipfile.ZIP_STORED or read_header is None:
+                    f.seek(0)
+                    arrays[name] = np.lib.format.read_array(f, allow_pickle=False)
+                    continue
+                shape, fortran_order, dtype = read_header(f)
+                npy_header_length = f.tell()
+                if dtype.hasobject or not shape or 0 in shape:
+                    f.seek(0)
+                    arrays[name] = np.lib.format.read_array(f, allow_pickle=False)
+                    continue
+            # 本地文件头: 30 字节定长部分 + 文件名 + 扩展字段
+            raw.seek(info.header_offset + 26)
+            filename_length, extra_length = struct.unpack('<HH', raw.read(4))
+            offset = info.header_offset + 30 + filename_length + extra_length + npy_header_length
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                                     order='F' if fortran_order else 'C')
+            _mappings.setdefault(os.path.abspath(path), []).append(weakref.ref(arrays[name]))
+    return arrays
+
+
+@functools.lru_cache(maxsize=64)
+def _file_hash(path, size, mtime_ns, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_hash(path, algorithm="blake2b"):
+    """文件内容哈希；同一进程内按 (路径, 大小, 修改时间) 记忆，同一个文件只读一遍"""
+    stat = os.stat(path)
+    return _file_hash(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, algorithm)
+
+
+class StageCache:
+    """内容寻址的阶段结果缓存，替代固定路径的 stubs/*.pkl
+
+    缓存键由阶段名和所有影响结果的参数（视频内容哈希、帧间隔、模型权重哈希、阶段参数等）
+    一起哈希得到，输入或参数变化时自动失效。结果以 NumPy 数组字典的形式保存为 .npz，
+    写入先落到临时文件再原子替换，多个进程同时运行也不会读到半个文件。
+    """
+    def __init__(self, cache_dir, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, stage, **params):
+        payload = json.dumps({"stage": stage, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key}.npz")
+
+    def load(self, stage, key):
+        """命中时返回 {名称: 数组}（内存映射），未命中、缓存关闭或文件损坏时返回 None"""
+        if not self.enabled:
+            return None
+        path = self.path(stage, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return load_npz(path)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+
+    def save(self, stage, key, arrays):
+        if not self.enabled:
+            return None
+        return save_npz(self.path(stage, key), arrays)
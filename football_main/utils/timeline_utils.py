@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class KeyframeTimeline:
+    """稀疏关键帧时间线：把按帧间隔处理的结果映射回原视频的每一帧
+
+    构造时用 searchsorted 预先算出每一帧前后最近的关键帧位置，之后每帧查询都是 O(1)。
+    """
+    def __init__(self, keyframe_indices, total_frames):
+        self.keyframe_indices = np.asarray(keyframe_indices, dtype=np.int64)
+        self.total_frames = total_frames
+
+        last_position = len(self.keyframe_indices) - 1
+        frames = np.arange(total_frames)
+        # 每帧之前（含自身）最近的关键帧在 keyframe_indices 中的位置，首个关键帧之前的帧归到第一个关键帧
+        self.prev_position = np.clip(np.searchsorted(self.keyframe_indices, frames, side='right') - 1, 0, last_position)
+        # 每帧之后（含自身）最近的关键帧位置，最后一个关键帧之后的帧归到最后一个关键帧
+        self.next_position = np.clip(np.searchsorted(self.keyframe_indices, frames, side='left'), 0, last_position)
+
+    def __len__(self):
+        return self.total_frames
+
+    def expand(self, keyframe_values):
+        """把每个关键帧一个值的序列扩展到每帧一个值（沿用前一关键帧的值）"""
+        return np.asarray(keyframe_values)[self.prev_position]
+
+    def neighbours(self, frame_num):
+        """返回 (前一关键帧位置, 后一关键帧位置, 插值权重 t)，t=0 表示完全取前一关键帧"""
+        prev_position = self.prev_position[frame_num]
+        next_position = self.next_position[frame_num]
+        prev_frame = self.keyframe_indices[prev_position]
+        next_frame = self.keyframe_indices[next_position]
+        if next_frame <= prev_frame:
+            return prev_position, next_position, 0.0
+        return prev_position, next_position, float(frame_num - prev_frame) / float(next_frame - prev_frame)
+
+    def track_view(self, keyframe_tracks, interpolate=True):
+        return TimelineTrackView(self, keyframe_tracks, interpolate)
+
+
+class TimelineTrackView:
+    """按原视频帧号访问关键帧跟踪数据的只读视图，行为与 tracks[object] 列表一致
+
+    interpolate 为 True 时，两个关键帧中都出现的目标按时间线性插值 bbox，
+    其余字段（队伍、控球、速度等）沿用前一关键帧；否则直接返回前一关键帧的数据。
+    """
+    def __init__(self, timeline, keyframe_tracks, interpolate=True):
+        self.timeline = timeline
+        self.keyframe_tracks = keyframe_tracks
+        self.interpolate = interpolate
+
+    def __len__(self):
+        return len(self.timeline)
+
+    def __getitem__(self, frame_num):
+        prev_position, next_position, t = self.timeline.neighbours(frame_num)
+        prev_tracks = self.keyframe_tracks[prev_position]
+        if not self.interpolate or t == 0.0:
+            return prev_tracks
+
+        next_tracks = self.keyframe_tracks[next_position]
+        frame_tracks = {}
+        for track_id, track_info in prev_tracks.items():
+            next_info = next_tracks.get(track_id)
+            if next_info is None:
+                frame_tracks[track_id] = track_info
+                continue
+            track_info = dict(track_info)
+            track_info['bbox'] = [a + (b - a) * t for a, b in zip(track_info['bbox'], next_info['bbox'])]
+            frame_tracks[track_id] = track_info
+        return frame_tracks
+
+    def __iter__(self):
+        for frame_num in range(len(self)):
+            yield self[frame_num]
@@ -0,0 +1,222 @@
+import numpy as np
+from .stage_cache import save_npz, load_npz
+
+# 目标类别编码，顺序与原 tracks 字典的键一致
+OBJECT_TYPES = ("players", "referees", "ball")
+OBJECT_CODES = {name: code for code, name in enumerate(OBJECT_TYPES)}
+
+# 列名 -> (dtype, 每行宽度, 缺省值)；宽度为 None 表示一维列
+COLUMNS = {
+    "frame": (np.int32, None, -1),
+    "track_id": (np.int32, None, -1),
+    "object": (np.int8, None, -1),
+    "bbox": (np.float32, 4, np.nan),
+    "position": (np.float32, 2, np.nan),
+    "position_adjusted": (np.float32, 2, np.nan),
+    "position_transformed": (np.float32, 2, np.nan),
+    "speed": (np.float32, None, np.nan),
+    "distance": (np.float32, None, np.nan),
+    "team": (np.int8, None, 0),
+    "team_color": (np.float32, 3, np.nan),
+    "has_ball": (np.bool_, None, False),
+}
+
+
+class TrackTable:
+    """列式（structure-of-arrays）跟踪数据表，替代 tracks[object][frame][track_id] 嵌套字典
+
+    每个检测占一行，所有字段存放在按列分配的 NumPy 数组中，行按帧号排序。
+    各处理阶段直接对整列做向量化计算；as_tracks() 返回与原嵌套字典接口一致的只读视图，
+    绘制代码无需修改。
+    """
+    def __init__(self, num_frames=0, capacity=1024):
+        self.num_frames = num_frames
+        self._size = 0
+        self._data = {name: self._empty(name, capacity) for name in COLUMNS}
+
+    @staticmethod
+    def _empty(name, length):
+        dtype, width, fill = COLUMNS[name]
+        shape = (length,) if width is None else (length, width)
+        return np.full(shape, fill, dtype=dtype)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, name):
+        # 返回的是底层数组的视图，可以直接原地写入
+        return self._data[name][:self._size]
+
+    def __setitem__(self, name, values):
+        self._data[name][:self._size] = values
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._data["frame"])
+        if needed <= capacity:
+            return
+        # 容量倍增，保证逐块追加的均摊复杂度为 O(1)
+        new_capacity = max(needed, capacity * 2)
+        for name, column in self._data.items():
+            grown = self._empty(name, new_capacity)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+
+    def append_rows(self, object_name, frames, track_ids, bboxes):
+        """追加一批同类别目标的检测行；frames 必须不小于已有行的帧号以保持按帧有序"""
+        count = len(frames)
+        if count == 0:
+            return
+        self._reserve(count)
+        rows = slice(self._size, self._size + count)
+        self._data["frame"][rows] = frames
+        self._data["track_id"][rows] = track_ids
+        self._data["object"][rows] = OBJECT_CODES[object_name]
+        self._data["bbox"][rows] = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        self._size += count
+
+    def keep_rows(self, mask):
+        """只保留 mask 为 True 的行"""
+        for name, column in self._data.items():
+            kept = column[:self._size][mask]
+            column[:len(kept)] = kept
+        self._size = int(np.count_nonzero(mask))
+
+    def sort_by_frame(self):
+        order = np.argsort(self["frame"], kind="stable")
+        for name, column in self._data.items():
+            column[:self._size] = column[:self._size][order]
+
+    def rows_between(self, start_frame, end_frame):
+        """返回帧号在 [start_frame, end_frame) 内所有行的切片，行按帧有序，二分查找即可"""
+        start, end = np.searchsorted(self["frame"], [start_frame, end_frame])
+        return slice(int(start), int(end))
+
+    def frame_rows(self, frame_num):
+        """返回第 frame_num 帧所有行的切片"""
+        return self.rows_between(frame_num, frame_num + 1)
+
+    def object_mask(self, object_name):
+        return self["object"] == OBJECT_CODES[object_name]
+
+    def object_rows(self, object_name, rows=slice(None)):
+        """返回 rows 切片范围内属于 object_name 的行号数组"""
+        return np.flatnonzero(self["object"][rows] == OBJECT_CODES[object_name]) + (rows.start or 0)
+
+    def find_row(self, object_name, frame_num, track_id):
+        rows = self.frame_rows(frame_num)
+        matches = np.flatnonzero((self["object"][rows] == OBJECT_CODES[object_name]) &
+                                 (self["track_id"][rows] == track_id))
+        return rows.start + matches[0] if len(matches) else -1
+
+    def ball_bboxes(self):
+        """返回 (num_frames, 4) 的球 bbox 数组，没有检测到球的帧为 NaN"""
+        bboxes = np.full((self.num_frames, 4), np.nan, dtype=np.float32)
+        mask = self.object_mask("ball")
+        bboxes[self["frame"][mask]] = self["bbox"][mask]
+        return bboxes
+
+    def set_ball_bboxes(self, bboxes):
+        """用 (num_frames, 4) 数组替换所有球的行，NaN 的帧不生成行"""
+        self.keep_rows(~self.object_mask("ball"))
+        bboxes = np.asarray(bboxes, dtype=np.float32)
+        frames = np.flatnonzero(~np.isnan(bboxes).any(axis=1))
+        self.append_rows("ball", frames, np.ones(len(frames), dtype=np.int32), bboxes[frames])
+        self.sort_by_frame()
+
+    def row_dict(self, row):
+        """把一行转换成与原嵌套字典中相同格式的 track_info"""
+        track_info = {"bbox": self._data["bbox"][row].tolist()}
+        position = self._data["position"][row]
+        if not np.isnan(position[0]):
+            track_info["position"] = tuple(position.tolist())
+        position_adjusted = self._data["position_adjusted"][row]
+        if not np.isnan(position_adjusted[0]):
+            track_info["position_adjusted"] = tuple(position_adjusted.tolist())
+            position_transformed = self._data["position_transformed"][row]
+            track_info["position_transformed"] = (None if np.isnan(position_transformed[0])
+                                                  else position_transformed.tolist())
+        if not np.isnan(self._data["speed"][row]):
+            track_info["speed"] = float(self._data["speed"][row])
+            track_info["distance"] = float(self._data["distance"][row])
+        if self._data["team"][row] > 0:
+            track_info["team"] = int(self._data["team"][row])
+            track_info["team_color"] = tuple(self._data["team_color"][row].tolist())
+        if self._data["has_ball"][row]:
+            track_info["has_ball"] = True
+        return track_info
+
+    def as_tracks(self):
+        """返回 {"players": 视图, "referees": 视图, "ball": 视图}，与原 tracks 字典用法一致"""
+        return {name: TrackTableView(self, name) for name in OBJECT_TYPES}
+
+    def to_arrays(self):
+        """导出为 {列名: 数组}（只含有效行），可直接用 np.savez 保存"""
+        arrays = {name: self[name] for name in COLUMNS}
+        arrays["num_frames"] = np.array(self.num_frames, dtype=np.int64)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """由 to_arrays() 的结果（例如从 .npz 读回的字典）重建跟踪表"""
+        size = len(arrays["frame"])
+        table = cls(int(arrays["num_frames"]), capacity=max(size, 1))
+        table._size = size
+        for name in COLUMNS:
+            table[name] = arrays[name]
+        return table
+
+    def save(self, path, **extra_arrays):
+        """按列保存为未压缩的 .npz，extra_arrays 一并写入（例如处理帧对应的原视频帧号）"""
+        return save_npz(path, {**self.to_arrays(), **extra_arrays})
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_arrays(load_npz(path, names=set(COLUMNS) | {"num_frames"}))
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        """从旧的嵌套字典格式（例如旧版 stub 文件）构建跟踪表"""
+        num_frames = max(len(object_tracks) for object_tracks in tracks.values())
+        table = cls(num_frames)
+        for frame_num in range(num_frames):
+            for object_name in OBJECT_TYPES:
+                object_tracks = tracks.get(object_name, [])
+                if frame_num >= len(object_tracks) or not object_tracks[frame_num]:
+                    continue
+                frame_tracks = object_tracks[frame_num]
+                table.append_rows(object_name,
+                                  [frame_num] * len(frame_tracks),
+                                  list(frame_tracks.keys()),
+                                  [track_info["bbox"] for track_info in frame_tracks.values()])
+        return table
+
+
+def load_track_columns(path, columns=None, mmap=True):
+    """只读取跟踪文件中需要的列（默认内存映射），不构建 TrackTable
+
+    例如 load_track_columns(path, ["frame", "object", "position_transformed"]) 取所有目标的场地坐标，
+    配合 OBJECT_CODES["ball"] 过滤出球的轨迹。
+    """
+    return load_npz(path, names=None if columns is None else set(columns), mmap=mmap)
+
+
+class TrackTableView:
+    """TrackTable 中某一类目标的只读视图，view[frame_num] 返回 {track_id: track_info}"""
+    def __init__(self, table, object_name):
+        self.table = table
+        self.object_code = OBJECT_CODES[object_name]
+
+    def __len__(self):
+        return self.table.num_frames
+
+    def __getitem__(self, frame_num):
+        rows = self.table.frame_rows(frame_num)
+        object_codes = self.table["object"][rows]
+        track_ids = self.table["track_id"][rows]
+        return {int(track_ids[i]): self.table.row_dict(rows.start + i)
+                for i in np.flatnonzero(object_codes == self.object_code)}
+
+    def __iter__(self):
+        for frame_num in range(len(self)):
+            yield self[frame_num]
@@ -8,6 +8,18 @@ def print_debug_info(message):
     timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print(f"[DEBUG {timestamp}] {message}")
 
+def get_video_info(video_path):
+    """读取视频元信息（帧数、FPS、分辨率），不解码任何帧"""
+    cap = cv2.VideoCapture(video_path)
+    info = {
+        "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    }
+    cap.release()
+    return info
+
 def read_video(video_path):
     print_debug_info(f"开始读取视频文件: {video_path}")
     
@@ -41,9 +53,103 @@ def read_video(video_path):
     print_debug_info(f"视频读取完成，共读取 {len(frames)} 帧")
     return frames
 
-def save_video(ouput_video_frames,output_video_path):
+def read_video_chunks(video_path, chunk_size=64):
+    """流式读取视频，每次产出 (起始帧号, 帧列表)，内存占用只与 chunk_size 有关"""
+    print_debug_info(f"开始流式读取视频文件: {video_path}, 块大小: {chunk_size}")
+
+    if not os.path.exists(video_path):
+        print_debug_info(f"错误：视频文件不存在: {video_path}")
+        return
+
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    start_frame = 0
+    chunk = []
+    try:
+        with tqdm(total=frame_count, desc="读取视频帧", unit="帧") as pbar:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                chunk.append(frame)
+                pbar.update(1)
+                if len(chunk) == chunk_size:
+                    yield start_frame, chunk
+                    start_frame += len(chunk)
+                    chunk = []
+        if chunk:
+            yield start_frame, chunk
+    finally:
+        cap.release()
+
+class SampledVideoReader:
+    """按帧间隔流式读取视频：跳过的帧只 grab() 不解码，保留的帧才 retrieve()
+
+    迭代产出 (帧号列表, 帧列表)，每块最多 chunk_size 个保留帧。
+    fps / frame_count 为原视频的信息；frames_read 为实际读到的帧数，
+    frames_decoded 为实际解码的帧数（迭代结束后有效）。
+    """
+    def __init__(self, video_path, frame_interval=1, chunk_size=64):
+        self.video_path = video_path
+        self.frame_interval = max(1, int(frame_interval))
+        self.chunk_size = chunk_size
+
+        info = get_video_info(video_path)
+        self.fps = info["fps"]
+        self.frame_count = info["frame_count"]
+        self.width = info["width"]
+        self.height = info["height"]
+        self.frames_read = 0
+        self.frames_decoded = 0
+
+    def __iter__(self):
+        print_debug_info(f"开始按帧间隔 {self.frame_interval} 读取视频文件: {self.video_path}")
+
+        if not os.path.exists(self.video_path):
+            print_debug_info(f"错误：视频文件不存在: {self.video_path}")
+            return
+
+        cap = cv2.VideoCapture(self.video_path)
+        self.frames_read = 0
+        self.frames_decoded = 0
+        indices = []
+        chunk = []
+        try:
+            with tqdm(total=self.frame_count, desc="读取视频帧", unit="帧") as pbar:
+                while cap.grab():
+                    frame_num = self.frames_read
+                    self.frames_read += 1
+                    pbar.update(1)
+                    if frame_num % self.frame_interval != 0:
+                        continue
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    self.frames_decoded += 1
+                    indices.append(frame_num)
+                    chunk.append(frame)
+                    if len(chunk) == self.chunk_size:
+                        yield indices, chunk
+                        indices = []
+                        chunk = []
+            if chunk:
+                yield indices, chunk
+        finally:
+            cap.release()
+        print_debug_info(f"视频读取完成，共 {self.frames_read} 帧，解码 {self.frames_decoded} 帧")
+
+def open_video_writer(output_video_path, frame_size, fps=24):
+    """创建视频写入器，frame_size 为 (宽, 高)"""
     fourcc = cv2.VideoWriter_fourcc(*'XVID')
-    out = cv2.VideoWriter(output_video_path, fourcc, 24, (ouput_video_frames[0].shape[1], ouput_video_frames[0].shape[0]))
+    return cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+
+def save_video(ouput_video_frames,output_video_path,fps=24):
+    # 支持列表或生成器输入，逐帧写入，不要求整段视频驻留内存
+    out = None
     for frame in ouput_video_frames:
+        if out is None:
+            out = open_video_writer(output_video_path, (frame.shape[1], frame.shape[0]), fps)
         out.write(frame)
-    out.release()
+    if out is not None:
+        out.release()
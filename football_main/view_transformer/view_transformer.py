@@ -33,13 +33,27 @@ class ViewTransformer():
         tranform_point = cv2.perspectiveTransform(reshaped_point,self.persepctive_trasnformer)
         return tranform_point.reshape(-1,2)
 
-    def add_transformed_position_to_tracks(self,tracks):
-        for object, object_tracks in tracks.items():
-            for frame_num, track in enumerate(object_tracks):
-                for track_id, track_info in track.items():
-                    position = track_info['position_adjusted']
-                    position = np.array(position)
-                    position_trasnformed = self.transform_point(position)
-                    if position_trasnformed is not None:
-                        position_trasnformed = position_trasnformed.squeeze().tolist()
-                    tracks[object][frame_num][track_id]['position_transformed'] = position_trasnformed
\ No newline at end of file
+    def points_inside(self,points):
+        # 向量化的点在四边形内判断（含边界），与逐点 pointPolygonTest 一样先把坐标取整
+        points = np.trunc(points)
+        vertices = self.pixel_vertices
+        edges = np.roll(vertices, -1, axis=0) - vertices
+        relative = points[:, None, :] - vertices[None, :, :]
+        cross = edges[None, :, 0] * relative[:, :, 1] - edges[None, :, 1] * relative[:, :, 0]
+        # 凸四边形：点在所有边的同一侧（或边上）即在内部
+        inside = np.all(cross >= 0, axis=1) | np.all(cross <= 0, axis=1)
+        return inside & ~np.isnan(points).any(axis=1)
+
+    def transform_points(self,points):
+        """批量变换 (N,2) 的像素坐标，返回 (N,2) 的球场坐标，四边形外的点为 NaN"""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        transformed = np.full(points.shape, np.nan, dtype=np.float32)
+        inside = self.points_inside(points)
+        if inside.any():
+            transformed[inside] = cv2.perspectiveTransform(points[inside].reshape(-1, 1, 2),
+                                                           self.persepctive_trasnformer).reshape(-1, 2)
+        return transformed
+
+    def add_transformed_position_to_tracks(self,tracks,rows=slice(None)):
+        # rows 可以只指定一段帧范围的行（如 tracks.rows_between(start, end)），一次批量写回
+        tracks["position_transformed"][rows] = self.transform_points(tracks["position_adjusted"][rows])
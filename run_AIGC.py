@@ -8,6 +8,9 @@ import subprocess
 import argparse
 import glob
 import threading
+import importlib.util
+import traceback
+import contextlib
 from datetime import datetime
 import requests
 
@@ -71,7 +74,8 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_DIR = os.path.join(CURRENT_DIR, "output")
 
 # 语音合成API地址 - 优先从环境变量获取
-VOICE_API_URL = os.environ.get('VOICE_SERVICE_URL', 'http://localhost:5001')
+DEFAULT_VOICE_API_URL = 'http://localhost:5001'
+VOICE_API_URL = os.environ.get('VOICE_SERVICE_URL', DEFAULT_VOICE_API_URL)
 print_debug_info(f"使用语音合成API地址: {VOICE_API_URL}")
 
 # FFMPEG路径
@@ -216,6 +220,68 @@ def run_python_script(script_path, *args, timeout=300, cwd=None):
         if 'process' in locals() and process.poll() is None:
             process.kill()
 
+FOOTBALL_MAIN_DIR = os.path.join(CURRENT_DIR, 'football_main')
+# football_main 的顶层包（utils / trackers 等）与其他子项目重名，常驻 worker 中只在分析期间
+# 放入 sys.modules 和 sys.path；任务之间保存在这里，已加载的常驻模型随模块对象保留下来
+_football_main_modules = {}
+
+
+def _football_main_names(football_main_dir):
+    """football_main 目录下可导入的顶层模块名"""
+    names = set()
+    for entry in os.listdir(football_main_dir):
+        path = os.path.join(football_main_dir, entry)
+        if entry.endswith('.py'):
+            names.add(entry[:-3])
+        elif os.path.isfile(os.path.join(path, '__init__.py')):
+            names.add(entry)
+    return names
+
+
+@contextlib.contextmanager
+def football_main_imports(football_main_dir=FOOTBALL_MAIN_DIR):
+    """在这个上下文中按 football_main 目录导入其模块，退出时恢复 sys.path 和同名的其他模块"""
+    football_main_dir = os.path.abspath(football_main_dir)
+    names = _football_main_names(football_main_dir)
+
+    def owned(name):
+        return name.split('.')[0] in names
+
+    shadowed = {name: sys.modules.pop(name) for name in list(sys.modules) if owned(name)}
+    sys.modules.update(_football_main_modules)
+    # football_main 的子模块导入时还会执行 sys.path.append('../')，退出时整体恢复
+    saved_path = list(sys.path)
+    sys.path.insert(0, football_main_dir)
+    try:
+        yield
+    finally:
+        sys.path[:] = saved_path
+        for name in [name for name in sys.modules if owned(name)]:
+            _football_main_modules[name] = sys.modules.pop(name)
+        sys.modules.update(shadowed)
+
+
+def run_football_analysis_in_process(main_script, *args):
+    """在当前进程中调用 football_main/main.py 的 main()，参数与命令行相同
+
+    供常驻分析 worker（analysis_worker.py）使用：torch / ultralytics 等只导入一次，
+    检测模型以 resident 方式加载，后续任务直接复用，不再为每个任务启动子进程。
+    main.py 每次重新执行，模块级状态不会从上一个任务带过来；路径参数须为绝对路径，不切换工作目录。
+    """
+    with football_main_imports(os.path.dirname(os.path.abspath(main_script))):
+        try:
+            spec = importlib.util.spec_from_file_location('football_main_entry', main_script)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.main(list(args), resident_models=True)
+            return True, ""
+        except SystemExit as e:
+            # 参数解析失败等情况 argparse 会调用 sys.exit
+            return e.code in (None, 0), f"football_main退出: {e.code}"
+        except Exception as e:
+            traceback.print_exc()
+            return False, str(e)
+
 # 语音合成函数
 def synthesize_audio_with_voice_api(text, language, voice):
     """使用语音API合成音频"""
@@ -350,8 +416,11 @@ def merge_audio_with_video(video_path, audio_path, output_path):
         print_debug_info(f"视频音频合并异常: {error_msg}")
         return False, error_msg
 
-def main():
-    """主函数"""
+def main(argv=None, in_process_analysis=False):
+    """主函数
+
+    argv 为 None 时解析命令行；in_process_analysis=True 时 football_main 在当前进程中运行（常驻 worker）。
+    """
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='足球视频解说生成工具')
     parser.add_argument('--language', type=str, default='汉语', choices=['汉语', 'English'],
@@ -364,7 +433,7 @@ def main():
                       help='解说词最大字数限制，默认500字')
     parser.add_argument('video_path', nargs='?', default=None,
                       help='输入视频路径（可选，不指定则使用input_videos目录中的最新视频）')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # 从环境变量覆盖参数
     env_language = os.environ.get('AIGC_LANGUAGE')
@@ -378,10 +447,11 @@ def main():
         print_debug_info(f"从环境变量获取语音设置: {args.voice}")
     
     # 从环境变量更新语音API地址
+    # 常驻 worker 中每个任务都重新确定，不沿用上一个任务的地址
     global VOICE_API_URL
     env_voice_url = os.environ.get('VOICE_SERVICE_URL')
+    VOICE_API_URL = env_voice_url or DEFAULT_VOICE_API_URL
     if env_voice_url:
-        VOICE_API_URL = env_voice_url
         print_debug_info(f"从环境变量更新语音API地址: {VOICE_API_URL}")
     
     print_debug_info(f"参数配置: 语言={args.language}, 语音={args.voice}, 帧间隔={args.frame_interval}, 最大字数={args.max_words}")
@@ -463,13 +533,20 @@ def main():
             # 即使找不到视频，也继续执行以生成默认解说词
     
     # 运行football_main模块
-    success, output = run_python_script(
-        main_script,
-        '--input_video', input_video,
-        '--frame_interval', str(args.frame_interval),
-        timeout=1800,  # 增加超时时间为30分钟，因为视频处理可能需要较长时间
-        cwd=os.path.join(project_root, 'football_main')  # 设置正确的工作目录
-    )
+    if in_process_analysis:
+        success, output = run_football_analysis_in_process(
+            main_script,
+            '--input_video', os.path.abspath(input_video),
+            '--frame_interval', str(args.frame_interval)
+        )
+    else:
+        success, output = run_python_script(
+            main_script,
+            '--input_video', input_video,
+            '--frame_interval', str(args.frame_interval),
+            timeout=1800,  # 增加超时时间为30分钟，因为视频处理可能需要较长时间
+            cwd=os.path.join(project_root, 'football_main')  # 设置正确的工作目录
+        )
     
     end_time = time.time()
     print_debug_info(f"football_main模块执行耗时: {end_time - start_time:.2f}秒")
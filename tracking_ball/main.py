@@ -4,14 +4,23 @@ from collections import deque
 import time
 import os
 import glob
+import sys
 import torch
 from ultralytics import YOLO
 
+# 复用 football_main 中的覆盖层合成工具
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'football_main'))
+from utils import blend_overlay
+from trackers.ball_roi import BallRoiDetector
+
 # 设置参数
 INPUT_FOLDER = "./input_video"  # 输入视频文件夹
 MODULE_PATH = "best.pt"  # 模型路径
 BALL_CLASS_ID = 0  # 球的类别ID
 CONF_THRESHOLD = 0.3  # 置信度阈值
+USE_BALL_ROI = True  # 先在卡尔曼预测位置附近的原分辨率裁剪区域内找球，找不到再整帧检测
+ROI_CROP_SIZE = 320  # ROI 裁剪区域边长(像素)
+FULL_FRAME_IMGSZ = 640  # 整帧检测的推理尺寸
 TRAJECTORY_SECONDS = 1  # 轨迹时间长度(秒)
 OUTPUT_FOLDER = "./output_video"  # 输出视频文件夹
 DELETE_ORIGINAL = False  # 是否删除原始视频
@@ -52,6 +61,7 @@ except Exception as e:
 cuda_available = torch.cuda.is_available()
 print(f"CUDA可用: {'是' if cuda_available else '否'}")
 device = "cuda" if cuda_available else "cpu"
+model.to(device)
 
 # 处理每个视频文件
 for video_index, VIDEO_PATH in enumerate(video_files):
@@ -101,41 +111,38 @@ for video_index, VIDEO_PATH in enumerate(video_files):
     frame_count = 0
     ball_detected_count = 0
 
+    # 每个视频使用新的球检测器（卡尔曼滤波状态不跨视频）
+    ball_detector = BallRoiDetector(model, BALL_CLASS_ID, ROI_CROP_SIZE, CONF_THRESHOLD,
+                                    full_frame_imgsz=FULL_FRAME_IMGSZ)
+    cap = cv2.VideoCapture(VIDEO_PATH)
+
     try:
-        # 使用模型预测
-        for result in model.predict(
-                source=VIDEO_PATH,
-                stream=True,
-                conf=CONF_THRESHOLD,
-                verbose=False,
-                device=device,  # 使用检测到的设备
-        ):
+        while True:
+            # 原始尺寸的帧，特效直接原地画在这一帧上
+            ret, output_frame = cap.read()
+            if not ret:
+                break
             frame_count += 1
 
-            # 获取原始尺寸的帧
-            orig_frame = result.orig_img.copy()
-            output_frame = orig_frame.copy()
+            # 只检测球：ROI 优先，失败再整帧检测
+            if USE_BALL_ROI:
+                ball = ball_detector.detect(output_frame)
+            else:
+                ball = ball_detector.search_full_frame(output_frame)
 
-            # 处理检测结果 - 只关注球
             ball_position = None
-            if result.boxes is not None:
-                for box in result.boxes:
-                    cls_id = int(box.cls)
-                    conf = float(box.conf)
-
-                    if cls_id == BALL_CLASS_ID and conf > CONF_THRESHOLD:
-                        # 获取边界框坐标
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        cx = int((x1 + x2) / 2)
-                        cy = int((y1 + y2) / 2)
+            if ball is not None:
+                # 获取边界框坐标
+                x1, y1, x2, y2 = map(int, ball[0])
+                cx = int((x1 + x2) / 2)
+                cy = int((y1 + y2) / 2)
 
-                        # 确保坐标在图像范围内
-                        cx = max(0, min(cx, orig_width - 1))
-                        cy = max(0, min(cy, orig_height - 1))
+                # 确保坐标在图像范围内
+                cx = max(0, min(cx, orig_width - 1))
+                cy = max(0, min(cy, orig_height - 1))
 
-                        ball_position = (cx, cy)
-                        ball_detected_count += 1
-                        break
+                ball_position = (cx, cy)
+                ball_detected_count += 1
 
             # 更新轨迹
             if ball_position:
@@ -146,18 +153,16 @@ for video_index, VIDEO_PATH in enumerate(video_files):
 
             # 只有当检测到球且有轨迹点时才生成特效
             if ball_position and len(trajectory) > 0:
-                # 创建轨迹覆盖层
-                overlay = np.zeros_like(orig_frame, dtype=np.uint8)
-
-                # 绘制球状拖尾效果
+                # 计算拖尾中每个球的位置、大小和颜色
+                circles = []
                 n = len(trajectory)
+                min_radius = 2
+                max_radius = 10
                 for i, point in enumerate(trajectory):
                     # 计算点在轨迹中的位置比例 (0表示最旧，1表示最新)
                     ratio = i / (n - 1) if n > 1 else 1.0
 
                     # 计算球的大小
-                    min_radius = 2
-                    max_radius = 10
                     radius = int(min_radius + (max_radius - min_radius) * ratio)
 
                     # 计算颜色 (从蓝色到红色渐变)
@@ -169,13 +174,19 @@ for video_index, VIDEO_PATH in enumerate(video_files):
                         b = int(255 * (1 - (ratio - 0.5) * 2))
                         g = int(255 * (1 - (ratio - 0.5) * 2))
                         r = int(255 * (ratio - 0.5) * 2)
+                    circles.append((point, radius, (b, g, r)))
 
-                    # 在覆盖层上绘制球
-                    cv2.circle(overlay, point, radius, (b, g, r), -1)
+                def draw_trail(overlay, origin):
+                    # 在覆盖层上绘制球状拖尾效果
+                    for point, radius, color in circles:
+                        cv2.circle(overlay, (point[0] - origin[0], point[1] - origin[1]), radius, color, -1)
 
-                # 将覆盖层叠加到原始帧上
+                # 只在拖尾的外接矩形内叠加覆盖层
+                points = np.array(trajectory)
+                trail_region = (points[:, 0].min() - max_radius, points[:, 1].min() - max_radius,
+                                points[:, 0].max() + max_radius, points[:, 1].max() + max_radius)
                 alpha = 0.7
-                output_frame = cv2.addWeighted(orig_frame, 1, overlay, alpha, 0)
+                blend_overlay(output_frame, trail_region, draw_trail, alpha, additive=True)
 
                 # 在最新位置绘制一个较大的实心红点
                 cv2.circle(output_frame, ball_position, 8, (0, 0, 255), -1)
@@ -207,6 +218,7 @@ for video_index, VIDEO_PATH in enumerate(video_files):
         traceback.print_exc()
     finally:
         # 确保资源释放
+        cap.release()
         if 'out' in locals() and out.isOpened():
             out.release()
             print("视频写入器已释放")
@@ -220,6 +232,9 @@ for video_index, VIDEO_PATH in enumerate(video_files):
     print(f"总用时: {elapsed_time:.2f}秒")
     print(f"平均帧率: {frame_count / max(0.01, elapsed_time):.2f} FPS")
     print(f"球检测率: {ball_detected_count}/{frame_count} ({detection_rate:.1f}%)")
+    if USE_BALL_ROI:
+        print(f"ROI 搜索: {ball_detector.roi_hits}/{ball_detector.roi_searches} 次命中, "
+              f"整帧检测: {ball_detector.full_frame_searches} 次")
     print(f"输出视频已保存至: {OUTPUT_PATH}")
 
     # 删除原视频文件
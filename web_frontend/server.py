@@ -5,6 +5,7 @@ import secrets
 import shutil
 import glob
 import threading
+import signal
 import subprocess
 import requests
 import sys
@@ -22,6 +23,13 @@ VOICE_SERVICE_URL = "http://localhost:5001"
 VOICE_SERVICE_PATH = os.path.join(PROJECT_ROOT, "football_voice")
 voice_service_process = None
 
+# 常驻分析 worker：模型常驻内存，生成解说的任务通过本地 socket 提交，不再每次启动 run_AIGC.py
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+import analysis_worker
+ANALYSIS_WORKER_SCRIPT = os.path.join(PROJECT_ROOT, "analysis_worker.py")
+analysis_worker_process = None
+
 # 配置上传文件夹和允许的文件类型
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 OUTPUT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outputs')
@@ -101,6 +109,73 @@ def check_and_start_voice_service():
         print(f"启动语音服务失败: {str(e)}")
         return False
 
+# 检查和启动常驻分析 worker
+def check_and_start_analysis_worker():
+    """检查分析 worker 是否运行，如未运行则启动并等待其完成模型预加载"""
+    global analysis_worker_process
+
+    if analysis_worker.ping() is not None:
+        return True
+    print("分析 worker 未运行，正在启动...")
+
+    try:
+        if analysis_worker_process is not None and analysis_worker_process.poll() is None:
+            print("分析 worker 进程已存在但未响应，尝试重启")
+            analysis_worker_process.terminate()
+            analysis_worker_process.wait(timeout=5)
+
+        # 输出直接继承服务器控制台，避免长期运行的进程写满管道
+        analysis_worker_process = subprocess.Popen([sys.executable, ANALYSIS_WORKER_SCRIPT], cwd=PROJECT_ROOT)
+
+        # 预加载需要导入 torch / ultralytics 并加载模型，最多等待 120 秒
+        print("正在等待分析 worker 预加载模型...")
+        for _ in range(120):
+            time.sleep(1)
+            if analysis_worker_process.poll() is not None:
+                break
+            if analysis_worker.ping() is not None:
+                print("分析 worker 已成功启动")
+                return True
+
+        print("警告：分析 worker 可能未成功启动，请手动检查")
+        return False
+    except Exception as e:
+        print(f"启动分析 worker 失败: {str(e)}")
+        return False
+
+def submit_analysis_job(argv, env, timeout):
+    """提交任务到分析 worker；任务开始前 worker 退出（例如前一个任务超时）时重启 worker 并重新提交一次"""
+    for attempt in range(2):
+        started = False
+        try:
+            for kind, payload in analysis_worker.submit_job(argv, env, timeout=timeout):
+                started = started or kind == 'started'
+                yield kind, payload
+            return
+        except (EOFError, OSError):
+            if started or attempt == 1:
+                raise
+            print("分析 worker 在任务开始前退出，重启后重新提交")
+            if not check_and_start_analysis_worker():
+                raise
+
+def stop_analysis_worker():
+    """终止分析 worker（任务超时后调用），正在执行和排队中的任务随之结束"""
+    pid = analysis_worker.ping()
+    try:
+        if analysis_worker_process is not None and analysis_worker_process.poll() is None:
+            analysis_worker_process.terminate()
+            try:
+                analysis_worker_process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                analysis_worker_process.kill()
+                analysis_worker_process.wait(timeout=5)
+        elif pid is not None:
+            # worker 不是本服务启动的，按 ping 返回的进程号终止
+            os.kill(pid, signal.SIGTERM)
+    except Exception as e:
+        print(f"终止分析 worker 失败: {str(e)}")
+
 # 支持的语言列表
 LANGUAGES = [
     {'code': 'zh-CN', 'name': '中文'},
@@ -610,41 +685,56 @@ def generate_commentary():
                     "complete": "处理完成"
                 }
 
-                # 设置环境变量
-                env = os.environ.copy()
-                env['VOICE_SERVICE_URL'] = VOICE_SERVICE_URL  # 确保run_AIGC.py能找到语音服务
-                
-                # 执行run_AIGC.py并传递参数
-                cmd = [
-                    'python', os.path.join(PROJECT_ROOT, 'run_AIGC.py'),
+                # 确保常驻分析 worker 正在运行
+                if not check_and_start_analysis_worker():
+                    task_status[task_id] = {
+                        'status': 'error',
+                        'message': '分析服务启动失败，无法生成解说',
+                        'progress_step': 0,
+                        'progress_max': 5
+                    }
+                    return
+
+                # 任务参数与 run_AIGC.py 的命令行参数相同
+                argv = [
                     '--language', language,
                     '--voice', voice,
                     '--frame_interval', str(frame_interval),
                     '--max_words', str(max_commentary_words)
                 ]
-                
-                print(f"启动视频处理进程: {' '.join(cmd)}")
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    cwd=PROJECT_ROOT,
-                    env=env
-                )
-
-                while process.poll() is None:
-                    # 检查超时
-                    if time.time() - start_time > timeout:
-                        process.kill()
-                        raise Exception("视频处理超时")
-                        
-                    # 读取输出
-                    line = process.stdout.readline()
-                    if line:
+                # 确保run_AIGC.py能找到语音服务
+                env = {'VOICE_SERVICE_URL': VOICE_SERVICE_URL}
+
+                print(f"提交视频处理任务到分析 worker: {' '.join(argv)}")
+                returncode = 1
+                started = False
+                try:
+                    for kind, payload in submit_analysis_job(argv, env, timeout):
+                        if kind == 'started':
+                            started = True
+                            continue
+                        if kind == 'queued':
+                            if payload > 0:
+                                task_status[task_id] = {
+                                    'status': 'processing',
+                                    'message': f'排队中，前面还有 {payload} 个任务...',
+                                    'progress_step': 0,
+                                    'progress_max': 5
+                                }
+                            continue
+                        if kind == 'exit':
+                            returncode = payload
+                            break
+
+                        # 读取输出；标准错误单独收集，用于失败时的错误信息
+                        line = payload
+                        if kind == 'stderr':
+                            stderr_output.append(line)
+                            print(line.strip())
+                            continue
                         stdout_output.append(line)
                         print(line.strip())
-                        
+
                         # 根据输出内容更新进度
                         if "tracking_ball" in line.lower():
                             task_status[task_id] = {
@@ -674,21 +764,23 @@ def generate_commentary():
                                 'progress_step': 4,
                                 'progress_max': 5
                             }
-                    
-                    time.sleep(0.1)  # 避免CPU占用过高
+                except TimeoutError:
+                    # worker 中的任务线程无法单独终止，重启 worker，避免卡住的任务阻塞后面的任务
+                    print("视频处理超时，正在重启分析 worker")
+                    stop_analysis_worker()
+                    check_and_start_analysis_worker()
+                    raise Exception("视频处理超时")
+                except (EOFError, OSError):
+                    raise Exception("分析 worker 异常退出" if started else "分析 worker 连接失败")
 
-                # 读取剩余输出
-                stdout_output.extend(process.stdout.readlines())
-                stderr_output.extend(process.stderr.readlines())
-                
                 # 合并输出
                 stdout_str = ''.join(stdout_output)
                 stderr_str = ''.join(stderr_output)
                 
-                print(f"run_AIGC.py输出:\n{stdout_str}")
+                print(f"run_AIGC输出:\n{stdout_str}")
                 
-                if process.returncode != 0:
-                    print(f"run_AIGC.py执行失败:\n{stderr_str}")
+                if returncode != 0:
+                    print(f"run_AIGC执行失败:\n{stderr_str}")
                     task_status[task_id] = {
                         'status': 'error', 
                         'message': f'AI解说生成失败: {stderr_str[:100]}...',